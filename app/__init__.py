@@ -1,5 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.exceptions import (
     create_exception_handler,
@@ -32,6 +33,9 @@ from app.routers.reviews import router as reviews_router
 from app.routers.homepage_sections import router as homepage_sections_router
 from app.routers.user_management import router as user_management_router
 from app.routers.mpesa import router as mpesa_router
+from app.services.mpesa_service import mpesa_service
+from app.db.database import warm_pool
+from app.core.log_config import setup_logging, shutdown_logging
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -48,6 +52,7 @@ app = FastAPI(
     title="Dira Healthcare API",
     description="This is an ecommerce platform API focused on the medical device industry.",
     version="1.0.0",
+    default_response_class=ORJSONResponse,  # orjson encodes responses in C
     servers=[  # This was also missing!
         {
             "url": "https://app.dirahealthtech.co.ke",
@@ -107,6 +112,25 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.on_event("startup")
+async def start_logging():
+    # Log records are written by a background thread, off the event loop
+    setup_logging()
+
+@app.on_event("startup")
+async def warm_db_pool():
+    # Pre-open database connections so the first requests skip the connect handshake
+    await warm_pool()
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    # Drain the pooled M-Pesa HTTP connections
+    await mpesa_service.aclose()
+
+@app.on_event("shutdown")
+async def stop_logging():
+    shutdown_logging()
+
 # Register custom exceptions
 
 # Auth-related exception handlers
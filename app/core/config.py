@@ -8,6 +8,15 @@ class Settings(BaseSettings):
     """
 
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 25
+    DB_MAX_OVERFLOW: int = 25
+    DB_POOL_TIMEOUT: int = 10       # seconds to wait for a connection before failing
+    DB_POOL_RECYCLE: int = 1800     # seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING: bool = True   # test connections on checkout; can be off behind PgBouncer
+    DB_POOL_WARMUP: int = 5         # connections opened at startup
+    DB_STATEMENT_CACHE_SIZE: int = 1024     # prepared statements cached per asyncpg connection
+    DB_QUERY_CACHE_SIZE: int = 1200         # compiled SQL statements kept in SQLAlchemy's LRU cache
+    DB_PGBOUNCER: bool = False              # connect through PgBouncer in transaction pooling mode
     SECRET_KEY: str
     JWT_SECRET: str
     JWT_ALGORITHM: str
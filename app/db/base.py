@@ -1,5 +1,13 @@
+from sqlalchemy import DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 
 
 # declarative base class for SQLAlchemy models
 Base = declarative_base()
+
+# gin_trgm_ops indexes (product and user search) need pg_trgm before any table is created
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
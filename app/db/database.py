@@ -1,3 +1,7 @@
+import asyncio
+from uuid import uuid4
+
+from sqlalchemy import text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
@@ -7,7 +11,39 @@ from ..core.config import Config
 
 DATABASE_URL = Config.DATABASE_URL
 
-engine = create_async_engine(DATABASE_URL)
+# Postgres always goes through the native asyncpg driver
+for _prefix in ("postgres://", "postgresql://", "postgresql+psycopg2://"):
+    if DATABASE_URL.startswith(_prefix):
+        DATABASE_URL = "postgresql+asyncpg://" + DATABASE_URL[len(_prefix):]
+        break
+
+# SQLite (development) doesn't use a sized connection pool
+engine_options = {} if DATABASE_URL.startswith("sqlite") else {
+    "pool_size": Config.DB_POOL_SIZE,
+    "max_overflow": Config.DB_MAX_OVERFLOW,
+    "pool_timeout": Config.DB_POOL_TIMEOUT,
+    "pool_recycle": Config.DB_POOL_RECYCLE,
+    "pool_pre_ping": Config.DB_POOL_PRE_PING,
+}
+
+if DATABASE_URL.startswith("postgresql+asyncpg://"):
+    if Config.DB_PGBOUNCER:
+        # Transaction pooling hands each transaction a different server connection, so
+        # prepared statements can't be cached and their names must never collide
+        engine_options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        # Cache prepared statements per connection
+        engine_options["connect_args"] = {
+            "statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+        }
+
+# Compiled SQL is cached per statement shape; size the LRU for the app's query surface
+engine = create_async_engine(DATABASE_URL, query_cache_size=Config.DB_QUERY_CACHE_SIZE, **engine_options)
 AsyncSessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -15,3 +51,15 @@ async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
+
+async def warm_pool(connections: int = Config.DB_POOL_WARMUP) -> None:
+    """Open pooled connections up front so the first requests don't pay the connect cost"""
+    if not connections or DATABASE_URL.startswith("sqlite"):
+        return
+
+    async def _ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Hold the connections concurrently so the pool really opens `connections` of them
+    await asyncio.gather(*(_ping() for _ in range(min(connections, Config.DB_POOL_SIZE))))
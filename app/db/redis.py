@@ -1,5 +1,7 @@
 from ..core.config import Config
 import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from typing import Optional
 
 
 JTI_EXPIRY =  Config.JTI_EXPIRY
@@ -12,6 +14,14 @@ token_blacklist = aioredis.StrictRedis(
     decode_responses=True,
 )
 
+# Short-lived response cache, kept apart from the token blacklist
+cache = aioredis.StrictRedis(
+    host=Config.REDIS_HOST,
+    port=Config.REDIS_PORT,
+    password=Config.REDIS_PASSWORD,
+    db=1,
+)
+
 
 async def add_token_to_blacklist(token_jti: str) -> None:
     await token_blacklist.set(
@@ -24,3 +34,23 @@ async def token_in_blacklist(token_jti: str) -> bool:
     token = await token_blacklist.get(token_jti)
 
     return token is not None   # return True if token is in blacklist else False
+
+
+async def cache_get(key: str) -> Optional[bytes]:
+    # A cache outage must never fail the request; treat it as a miss
+    try:
+        return await cache.get(key)
+    except RedisError:
+        return None
+
+async def cache_set(key: str, value: bytes, ttl: int) -> None:
+    try:
+        await cache.set(name=key, value=value, ex=ttl)
+    except RedisError:
+        pass
+
+async def cache_delete(*keys: str) -> None:
+    try:
+        await cache.delete(*keys)
+    except RedisError:
+        pass
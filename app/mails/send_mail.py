@@ -1,4 +1,5 @@
 from fastapi_mail import ConnectionConfig, FastMail
+from jinja2 import Environment, FileSystemLoader
 from pathlib import Path
 
 from ..core.config import Config
@@ -7,8 +8,18 @@ from ..core.config import Config
 BASE_DIR = Path(__file__).resolve().parent
 MESSAGE_TEMPLATE_PATH = Path(BASE_DIR, 'templates')
 
+# One shared environment so each template is parsed and compiled once per process
+# (auto_reload=False also skips the per-render stat() of the template file)
+template_env = Environment(loader=FileSystemLoader(MESSAGE_TEMPLATE_PATH), auto_reload=False)
 
-mail_config = ConnectionConfig(
+
+class CachedTemplateConnectionConfig(ConnectionConfig):
+    # fastapi-mail builds a fresh Environment for every message by default
+    def template_engine(self) -> Environment:
+        return template_env
+
+
+mail_config = CachedTemplateConnectionConfig(
     MAIL_USERNAME = Config.MAIL_USERNAME,
     MAIL_PASSWORD = Config.MAIL_PASSWORD,
     MAIL_FROM = Config.MAIL_FROM,
@@ -30,6 +30,7 @@ from .cart import Cart
 from .cart_service_item import CartServiceItem
 from .coupon import Coupon
 from .order_status_history import OrderStatusHistory
+from .order_note import OrderNote
 from .order_cancellation import OrderCancellation
 from .payment_transaction import PaymentTransaction
 from .refund import Refund
@@ -73,6 +74,7 @@ __all__ = [
     "ShipmentTracking",
     "ShipmentCheckpoint",
     "OrderStatusHistory",
+    "OrderNote",
     "PaymentTransaction",
     "OrderCancellation",
     "Refund",
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -13,7 +13,7 @@ class MpesaTransaction(Base, TimeStampMixin):
     
     # Transaction identifiers
     merchant_request_id = Column(String(50), nullable=True, index=True)
-    checkout_request_id = Column(String(50), nullable=True, index=True)
+    checkout_request_id = Column(String(50), nullable=True, index=True, unique=True)  # Callback lookup key
     mpesa_receipt_number = Column(String(20), nullable=True, index=True, unique=True)
     
     # Transaction details
@@ -23,7 +23,7 @@ class MpesaTransaction(Base, TimeStampMixin):
     transaction_status = Column(String(20), default="pending")  # MpesaTransactionStatus
     
     # Order relationship
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=True, index=True)
     
     # STK Push details
     stk_callback_response = Column(Text, nullable=True)  # JSON response from callback
@@ -74,6 +74,16 @@ class MpesaConfiguration(Base, TimeStampMixin):
     initiator_name = Column(String(50), nullable=True)  # For B2C transactions
     security_credential = Column(Text, nullable=True)   # Encrypted initiator password
 
+    # Partial index for looking up the active configuration
+    __table_args__ = (
+        Index(
+            "ix_mpesa_config_active",
+            "id",
+            postgresql_where=is_active.is_(True),
+            sqlite_where=is_active.is_(True),
+        ),
+    )
+
 
 class MpesaCallback(Base, TimeStampMixin):
     __tablename__ = "mpesa_callbacks"
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, DateTime, Enum, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, DateTime, Enum, JSON, Index
 from sqlalchemy.orm import relationship
 
 from ..db.base import Base
@@ -43,11 +43,18 @@ class Order(Base, TimeStampMixin):
     prescription = relationship("Prescription")
     shipment_tracking = relationship("ShipmentTracking", back_populates="order", uselist=False)
     status_history = relationship("OrderStatusHistory", back_populates="order", cascade="all, delete-orphan")
+    note_entries = relationship("OrderNote", back_populates="order", cascade="all, delete-orphan", order_by="OrderNote.created_at")
     transactions = relationship("PaymentTransaction", back_populates="order", cascade="all, delete-orphan")
     cancellation = relationship("OrderCancellation", back_populates="order", uselist=False, cascade="all, delete-orphan")
     refunds = relationship("Refund", back_populates="order", cascade="all, delete-orphan")
     mpesa_transactions = relationship("MpesaTransaction", back_populates="order", cascade="all, delete-orphan")
 
+    # Dashboard aggregates filter on status/payment_status plus a created_at range and sum total
+    __table_args__ = (
+        Index("ix_orders_status_created_at", "status", "created_at", postgresql_include=["total"]),
+        Index("ix_orders_payment_status_created_at", "payment_status", "created_at", postgresql_include=["total"]),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+    )
 
     def __repr__(self):
         return f'<Order(id={self.id}, order_number={self.order_number}, customer_id={self.customer_id}, status={self.status})>'
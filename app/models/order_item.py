@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from ..db.base import Base
@@ -19,6 +19,9 @@ class OrderItem(Base, TimeStampMixin):
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
 
+    __table_args__ = (
+        Index("ix_order_items_order_id", "order_id", postgresql_include=["quantity"]),
+    )
 
     def __repr__(self):
         return f'<OrderItem(id={self.id}, order_id={self.order_id}, product_id={self.product_id}, quantity={self.quantity})>'
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, Text, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from ..db.base import Base
+
+class OrderNote(Base):
+    __tablename__ = "order_notes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+
+    # Relationships
+    order = relationship("Order", back_populates="note_entries")
+    author = relationship("User")
+
+    # Notes are always read per order in insertion order
+    __table_args__ = (
+        Index("ix_order_notes_order_id_created_at", "order_id", "created_at"),
+    )
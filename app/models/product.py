@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, Float, ForeignKey, JSON, Enum, Index, cast
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
 from ..db.base import Base
@@ -45,6 +46,17 @@ class Product(Base, TimeStampMixin):
     homepage_sections = relationship("HomepageSection", secondary="homepage_section_products", back_populates="products")
     reviews = relationship("Review", back_populates="product", cascade="all, delete-orphan")
 
+    # Recommendations match tags with jsonb ?| and name search uses ILIKE '%...%';
+    # both are GIN-indexed on Postgres only
+    __table_args__ = (
+        Index("ix_products_active_created_at_id", "is_active", "created_at", "id"),
+        Index("ix_products_tags_gin", cast(tags, JSONB), postgresql_using="gin").ddl_if(dialect="postgresql"),
+        Index(
+            "ix_products_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
     def __repr__(self):
         return f"<Product(id={self.id}, category_id={self.category_id}, supplier_id={self.supplier_id})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..db.base import Base
@@ -23,6 +23,11 @@ class Review(Base, TimeStampMixin):
     user = relationship("User", back_populates="reviews")
     review_votes = relationship("ReviewVote", back_populates="review", cascade="all, delete-orphan")
 
+    # One review per user per product
+    __table_args__ = (
+        Index("uq_reviews_user_id_product_id", "user_id", "product_id", unique=True),
+    )
+
 
 class ReviewVote(Base, TimeStampMixin):
     __tablename__ = "review_votes"
@@ -38,5 +43,6 @@ class ReviewVote(Base, TimeStampMixin):
 
     # Ensure one vote per user per review
     __table_args__ = (
+        Index("uq_review_votes_review_id_user_id", "review_id", "user_id", unique=True),
         {"extend_existing": True},
     )
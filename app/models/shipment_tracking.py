@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -24,4 +24,9 @@ class ShipmentTracking(Base, TimeStampMixin):
     # Status checkpoints
     checkpoints = relationship("ShipmentCheckpoint", back_populates="shipment", 
                               order_by="ShipmentCheckpoint.timestamp", 
-                              cascade="all, delete-orphan")
\ No newline at end of file
+                              cascade="all, delete-orphan")
+
+    # One tracking record per order; also the conflict target for tracking upserts
+    __table_args__ = (
+        Index("uq_shipment_trackings_order_id", "order_id", unique=True),
+    )
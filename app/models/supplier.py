@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Text, Boolean, Float, JSON, Enum
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, Boolean, Float, JSON, Enum, Index
 from sqlalchemy.orm import relationship
 import enum
 
@@ -30,6 +30,11 @@ class Supplier(Base, TimeStampMixin):
     purchase_orders = relationship("PurchaseOrder", back_populates="supplier")
     admin = relationship("User", back_populates="suppliers")
 
+    # A supplier name is unique per admin
+    __table_args__ = (
+        Index("uq_suppliers_admin_id_name", "admin_id", "name", unique=True),
+    )
+
 
     def __repr__(self):
         return f'<Supplier(name={self.name}, admin_id={self.admin_id}, email={self.email})>'
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Enum, Integer, String
+from sqlalchemy import Boolean, Column, DateTime, Enum, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from ..db.base import Base
@@ -31,5 +31,18 @@ class User(Base, TimeStampMixin):
     review_votes = relationship("ReviewVote", back_populates="user", cascade="all, delete-orphan")
 
 
+    # Admin user listing pages by (created_at, id); its ILIKE '%...%' search is
+    # trigram-indexed per column on Postgres so the OR can combine index scans
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        *(
+            Index(
+                f"ix_users_{column}_trgm", column,
+                postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+            ).ddl_if(dialect="postgresql")
+            for column in ("first_name", "last_name", "email", "phone_number")
+        ),
+    )
+
     def __repr__(self):
         return f'<User(email={self.email}, first_name={self.first_name}, last_name={self.last_name}, role={self.role})>'
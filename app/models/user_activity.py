@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Integer, String, Index
 
 from .base import TimeStampMixin
 from ..db.base import Base
@@ -22,6 +22,12 @@ class UserActivity(Base, TimeStampMixin):
     activity_type = Column(String(20), default=ActivityType.VIEW)
     timestamp = Column(DateTime, default=datetime.now(timezone.utc))
 
+    # Top picks read a visitor's most recent activity first
+    __table_args__ = (
+        Index("ix_user_activities_user_id_timestamp", "user_id", timestamp.desc()),
+        Index("ix_user_activities_anonymous_id_timestamp", "anonymous_id", timestamp.desc()),
+    )
+
 
     def __repr__(self):
         return f'<UserActivity(user_id={self.user_id}, product_id={self.product_id}, activity_type={self.activity_type})>'
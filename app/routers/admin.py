@@ -6,6 +6,7 @@ from sqlalchemy.future import select
 from sqlalchemy import select as sql_select
 from typing import List, Optional
 import json
+import logging
 from datetime import datetime
 
 from ..core.dependencies import get_db, RoleChecker, get_current_admin
@@ -48,6 +49,7 @@ from ..models.order import OrderStatus
 router = APIRouter()
 
 admin_only = Depends(RoleChecker([UserRole.ADMIN]))
+logger = logging.getLogger(__name__)
 admin_service = AdminService()
 auth_service = AuthService()
 file_service = FileService()
@@ -123,7 +125,7 @@ async def setup_initial_admin(user_data: CreateAdminUser, db: AsyncSession = Dep
         result = await db.execute(admin_query)
         admin_count = result.scalar()
         
-        print(f"Current admin count: {admin_count}")
+        logger.info("Current admin count: %s", admin_count)
         
         # Only allow creation if no admin exists
         if admin_count > 0:
@@ -135,7 +137,7 @@ async def setup_initial_admin(user_data: CreateAdminUser, db: AsyncSession = Dep
             # Create first admin user
             new_user = await auth_service.create_admin_user(user_data, UserRole.ADMIN, db)
             
-            print(f"Admin user created successfully: {new_user.email}")
+            logger.info("Admin user created successfully: %s", new_user.email)
             
             return JSONResponse(
                 status_code=status.HTTP_201_CREATED,
@@ -147,7 +149,7 @@ async def setup_initial_admin(user_data: CreateAdminUser, db: AsyncSession = Dep
                 }
             )
         except Exception as inner_e:
-            print(f"Error in auth_service.create_admin_user: {str(inner_e)}")
+            logger.exception("Error in auth_service.create_admin_user")
             raise
             
     except Exception as e:
@@ -938,7 +940,9 @@ async def get_all_orders(
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(20, ge=1, le=100, description="Items per page"),
     sort_by: str = Query("created_at", description="Sort by field"),
-    sort_order: str = Query("desc", description="Sort order (asc/desc)")
+    sort_order: str = Query("desc", description="Sort order (asc/desc)"),
+    after_created_at: Optional[datetime] = Query(None, description="created_at of the last order on the previous page (keyset pagination)"),
+    after_id: Optional[int] = Query(None, description="ID of the last order on the previous page (keyset pagination)")
 ):
     """
     **Get All Orders (Admin)**
@@ -957,6 +961,8 @@ async def get_all_orders(
     - **size**: Number of orders per page (default: 20, max: 100)
     - **sort_by**: Field to sort by (created_at, total, status, etc.)
     - **sort_order**: Sort direction (asc/desc, default: desc)
+    - **after_created_at** / **after_id**: Pass the last order's created_at and id to fetch the next
+      page by keyset instead of page number (sort_by=created_at only; much faster on deep pages)
     
     **Returns:**
     - List of orders with basic information
@@ -983,7 +989,8 @@ async def get_all_orders(
             date_from=date_from,
             date_to=date_to,
             sort_by=sort_by,
-            sort_order=sort_order
+            sort_order=sort_order,
+            after=(after_created_at, after_id) if after_created_at is not None and after_id is not None else None
         )
         
         return all_orders
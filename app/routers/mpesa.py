@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+import logging
+
+import orjson
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
@@ -18,6 +22,7 @@ from ..services.mpesa_service import mpesa_service
 from ..exceptions import NotFoundException, BadRequestException
 
 router = APIRouter(prefix="/payments", tags=["M-Pesa Payments"])
+logger = logging.getLogger(__name__)
 
 admin_only = Depends(RoleChecker([UserRole.ADMIN]))
 
@@ -221,7 +226,11 @@ async def check_payment_status(
 
 
 @router.post("/mpesa/callback")
-async def mpesa_callback(request: Request, db: AsyncSession = Depends(get_db)):
+async def mpesa_callback(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
     """
     **M-Pesa Callback Endpoint**
     
@@ -231,10 +240,10 @@ async def mpesa_callback(request: Request, db: AsyncSession = Depends(get_db)):
     
     **Process:**
     1. Receives callback data from M-Pesa
-    2. Validates and processes transaction status
-    3. Updates internal transaction records
-    4. Updates related order status if applicable
-    5. Stores callback for audit purposes
+    2. Stores callback for audit purposes and acknowledges immediately
+    3. In the background, validates and processes transaction status
+    4. Updates internal transaction records
+    5. Updates related order status if applicable
     
     **Callback Types:**
     - **Success**: Payment completed successfully
@@ -244,20 +253,20 @@ async def mpesa_callback(request: Request, db: AsyncSession = Depends(get_db)):
     **Security:** Ensure this endpoint is properly secured and only accessible by M-Pesa servers
     """
     try:
-        # Get the raw callback data
-        callback_data = await request.json()
+        # Get the raw callback data; the body is kept so it can be stored as-is
+        raw_body = await request.body()
+        callback_data = orjson.loads(raw_body)
         
-        # Process the callback
-        success = await mpesa_service.process_callback(callback_data, db)
+        # Store the raw callback and acknowledge straight away; the transaction
+        # and order updates run after the response is sent
+        callback_id = await mpesa_service.persist_callback(callback_data, db, raw_body=raw_body)
+        background_tasks.add_task(mpesa_service.finalise_callback, callback_id, callback_data)
         
-        if success:
-            return {"ResultCode": 0, "ResultDesc": "Success"}
-        else:
-            return {"ResultCode": 1, "ResultDesc": "Failed to process callback"}
+        return {"ResultCode": 0, "ResultDesc": "Success"}
         
     except Exception as e:
         # Log the error but return success to M-Pesa to avoid retries
-        print(f"Callback processing error: {str(e)}")
+        logger.exception("Callback processing error")
         return {"ResultCode": 0, "ResultDesc": "Received"}
 
 
@@ -258,12 +258,9 @@ async def get_order_statistics(
     - Available to authenticated customers for their own data
     """
     try:
-        # Get all user orders to calculate statistics
-        all_orders = await order_service.get_user_orders(current_user.id, db, 0, 1000)
-        
         # Calculate statistics
         stats = {
-            "total_orders": len(all_orders),
+            "total_orders": 0,
             "orders_by_status": {},
             "total_spent": 0.0,
             "average_order_value": 0.0,
@@ -271,23 +268,30 @@ async def get_order_statistics(
             "recent_orders": []
         }
         
-        # Count orders by status and calculate totals
-        for order in all_orders:
+        now = datetime.now()
+        recent_orders = []
+        
+        # Stream the user's orders (newest first) in batches, counting by status and totals as we go
+        async for order in order_service.stream_user_order_summaries(current_user.id, db, limit=1000):
+            stats["total_orders"] += 1
             status = order.status
             stats["orders_by_status"][status] = stats["orders_by_status"].get(status, 0) + 1
             stats["total_spent"] += order.total
             
             # Count recent orders (last 30 days)
-            days_ago = (datetime.now() - order.created_at).days
+            days_ago = (now - order.created_at).days
             if days_ago <= 30:
                 stats["orders_last_30_days"] += 1
+            
+            # Keep the most recent orders (rows arrive newest first)
+            if len(recent_orders) < 5:
+                recent_orders.append(order)
         
         # Calculate average order value
         if stats["total_orders"] > 0:
             stats["average_order_value"] = stats["total_spent"] / stats["total_orders"]
         
         # Get recent orders (last 5)
-        recent_orders = sorted(all_orders, key=lambda x: x.created_at, reverse=True)[:5]
         stats["recent_orders"] = [
             {
                 "order_id": order.id,
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from typing import List, Optional
 
 from ..core.dependencies import get_anonymous_user, get_db
@@ -51,6 +52,8 @@ async def get_top_picks(
 @router.get('/homepage', response_model=List[SimpleProductResponse])
 async def get_products(
     name: Optional[str] = Query(None, description="Filter products by name (partial match)"),
+    after_created_at: Optional[datetime] = Query(None, description="created_at of the last product on the previous page"),
+    after_id: Optional[int] = Query(None, description="ID of the last product on the previous page"),
     service: UserActivityService = Depends(get_user_activity_service)
 ):
     """
@@ -60,8 +63,10 @@ async def get_products(
     **Query Parameters:**
     
     - **name**: Filter products by name (optional, partial match, case-insensitive)
+    - **after_created_at** / **after_id**: Pass the last product's created_at and id to fetch the next page
     """
-    return await service.get_products(name=name)
+    after = (after_created_at, after_id) if after_created_at is not None and after_id is not None else None
+    return await service.get_products(name=name, after=after)
 
 @router.get('/product/{slug}', response_model=ProductResponse)
 async def get_product_details_by_slug(
@@ -32,6 +32,7 @@ async def get_all_users(
     is_verified: Optional[bool] = Query(None, description="Filter by verification status"),
     created_after: Optional[datetime] = Query(None, description="Filter users created after this date"),
     created_before: Optional[datetime] = Query(None, description="Filter users created before this date"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (keyset pagination)"),
     db: AsyncSession = Depends(get_db),
     _: dict = admin_only
 ):
@@ -52,6 +53,8 @@ async def get_all_users(
     - **is_verified**: Filter by account verification status
     - **created_after**: Show only users registered after this date
     - **created_before**: Show only users registered before this date
+    - **cursor**: Pass the previous response's next_cursor to fetch the next page by keyset
+      instead of skip (much faster on deep pages); cursor pages report has_next instead of total/pages
     
     **Returns:** Paginated list with user summaries and pagination metadata
     """
@@ -68,11 +71,14 @@ async def get_all_users(
             skip=skip,
             limit=limit,
             search=search,
-            filters=filters
+            filters=filters,
+            cursor=cursor
         )
         
         return result
         
+    except BadRequestException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -88,6 +88,7 @@ class SimpleProductResponse(BaseModel):
     category_id: int
     pricing: PricingSchema
     images: Optional[str] = None
+    created_at: Optional[datetime] = None
 
     @model_validator(mode='before')
     @classmethod
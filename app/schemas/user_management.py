@@ -1,9 +1,9 @@
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from typing import Any, List, Optional
 from datetime import datetime
 from enum import Enum
 
-from app.enums import UserRole, OrderStatus
+from app.enums import UserRole, OrderStatus, CustomerType
 
 
 class UserStatus(str, Enum):
@@ -47,9 +47,22 @@ class OrderSummaryResponse(BaseModel):
         from_attributes = True
 
 
+class CustomerProfileResponse(BaseModel):
+    id: int
+    user_id: int
+    customer_type: CustomerType
+    organization_name: Optional[str] = None
+    organization_position: Optional[str] = None
+    organization_registration: Optional[str] = None
+    medical_history: Optional[Any] = None
+
+    class Config:
+        from_attributes = True
+
+
 class UserDetailResponse(UserSummaryResponse):
     # Additional detailed information
-    customer_profile: Optional[dict] = None
+    customer_profile: Optional[CustomerProfileResponse] = None
     recent_orders: List[OrderSummaryResponse] = []
     total_reviews: int = 0
     account_created: datetime
@@ -61,10 +74,12 @@ class UserDetailResponse(UserSummaryResponse):
 
 class UserListResponse(BaseModel):
     users: List[UserSummaryResponse]
-    total: int
+    total: Optional[int] = None  # Not computed for cursor pages
     page: int
     per_page: int
-    pages: int
+    pages: Optional[int] = None  # Not computed for cursor pages
+    has_next: bool = False
+    next_cursor: Optional[str] = None  # Pass back as `cursor` to fetch the next page
 
     class Config:
         from_attributes = True
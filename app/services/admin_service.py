@@ -1,3 +1,5 @@
+import logging
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update, delete, func, desc, and_
@@ -10,6 +12,8 @@ from ..schemas.product import ProductCreate, ProductUpdate
 from ..schemas.category import CategoryUpdate
 from ..exceptions import NotFoundException, ConflictException, BadRequestException
 
+logger = logging.getLogger(__name__)
+
 class AdminService:
     async def generate_unique_slug(self, name: str, product_id: Optional[int], db: AsyncSession) -> str:
         """
@@ -133,7 +137,7 @@ class AdminService:
             raise
         except Exception as e:
             await db.rollback()
-            print(f"Error creating product: {e}")
+            logger.exception("Error creating product")
             raise BadRequestException(f"Failed to create product: {str(e)}")
 
     async def get_product_by_id(self, product_id: int, db: AsyncSession) -> Product:
@@ -179,33 +183,18 @@ class AdminService:
         Returns products and total count
         """
         try:
-            # Start with base query
-            query = select(Product)
-            
-            # Apply filters
+            # Build the filter conditions once
+            conditions = []
             if name:
-                query = query.where(Product.name.ilike(f"%{name}%"))
+                conditions.append(Product.name.ilike(f"%{name}%"))
             if category_id:
-                query = query.where(Product.category_id == category_id)
+                conditions.append(Product.category_id == category_id)
             if is_active is not None:
-                query = query.where(Product.is_active == is_active)
+                conditions.append(Product.is_active == is_active)
             if requires_prescription is not None:
-                query = query.where(Product.requires_prescription == requires_prescription)
+                conditions.append(Product.requires_prescription == requires_prescription)
             
-            # Get total count for pagination
-            count_query = select(func.count()).select_from(Product)
-            # Apply the same filters to count query
-            if name:
-                count_query = count_query.where(Product.name.ilike(f"%{name}%"))
-            if category_id:
-                count_query = count_query.where(Product.category_id == category_id)
-            if is_active is not None:
-                count_query = count_query.where(Product.is_active == is_active)
-            if requires_prescription is not None:
-                count_query = count_query.where(Product.requires_prescription == requires_prescription)
-                
-            total_count_result = await db.execute(count_query)
-            total_count = total_count_result.scalar() or 0
+            query = select(Product).where(*conditions)
             
             # Apply sorting
             if hasattr(Product, sort_by):
@@ -214,16 +203,28 @@ class AdminService:
                 else:
                     query = query.order_by(getattr(Product, sort_by))
             
-            # Apply pagination
-            query = query.offset(skip).limit(limit)
-            
-            # Execute query
-            result = await db.execute(query)
-            products = result.scalars().all()
+            # Fetch the page together with the total count via a window function
+            page_query = (
+                query.add_columns(func.count().over().label("total_count"))
+                .offset(skip)
+                .limit(limit)
+            )
+            result = await db.execute(page_query)
+            rows = result.all()
+            products = [row[0] for row in rows]
+            
+            if rows:
+                total_count = rows[0].total_count
+            elif skip:
+                # Page past the end; fall back to a plain count of the filtered rows
+                count_query = select(func.count(Product.id)).where(*conditions)
+                total_count = (await db.execute(count_query)).scalar() or 0
+            else:
+                total_count = 0
             
             return products, total_count
         except Exception as e:
-            print(f"Error listing products: {e}")
+            logger.exception("Error listing products")
             return [], 0
     
     async def update_product(self, product_id: int, product_data: ProductUpdate, db: AsyncSession) -> Product:
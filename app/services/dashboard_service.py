@@ -1,9 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_, desc, text, or_, case
 from sqlalchemy.orm import selectinload
+import asyncio
+import time
 from datetime import datetime, timedelta
-from typing import List
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
 
+from ..db.database import AsyncSessionLocal
 from ..models.user import User
 from ..models.product import Product
 from ..models.category import Category
@@ -31,20 +34,46 @@ from ..schemas.dashboard import (
 )
 
 
+T = TypeVar("T")
+
+# Seconds an order aggregate snapshot is served before it is recomputed
+ORDER_AGGREGATES_TTL = 60
+
+# Pool connections the dashboard may hold at once, across all concurrent dashboard requests
+DASHBOARD_MAX_SESSIONS = 4
+
+
 class DashboardService:
     
+    def __init__(self):
+        self._order_aggregates: Optional[Tuple[float, Dict[str, int]]] = None
+        self._order_aggregates_expiry = 0.0
+        self._sessions = asyncio.Semaphore(DASHBOARD_MAX_SESSIONS)
+    
     async def get_dashboard_data(self, db: AsyncSession) -> DashboardResponse:
         """Get comprehensive dashboard data for admin"""
         
-        # Get all data concurrently
-        summary_data = await self._get_summary_stats(db)
-        sales_data = await self._get_sales_stats(db)
-        products_data = await self._get_product_stats(db)
-        users_data = await self._get_user_stats(db)
-        orders_data = await self._get_order_stats(db)
-        reviews_data = await self._get_review_stats(db)
-        revenue_by_category = await self._get_revenue_by_category(db)
-        alerts_data = await self._get_system_alerts(db)
+        # Get all data concurrently; a session runs one statement at a time, so each
+        # section gets its own session, with the number of open sessions capped
+        (
+            summary_data,
+            sales_data,
+            products_data,
+            users_data,
+            orders_data,
+            reviews_data,
+            revenue_by_category,
+            alerts_data
+        ) = await asyncio.gather(
+            self._in_own_session(self._get_summary_stats),
+            self._in_own_session(self._get_sales_stats),
+            self._in_own_session(self._get_product_stats),
+            self._in_own_session(self._get_user_stats),
+            self._in_own_session(self._get_order_stats),
+            self._in_own_session(self._get_review_stats),
+            self._in_own_session(self._get_revenue_by_category),
+            self._in_own_session(self._get_system_alerts)
+        )
         
         return DashboardResponse(
             summary=summary_data,
@@ -58,6 +87,12 @@ class DashboardService:
             last_updated=datetime.utcnow()
         )
     
+    async def _in_own_session(self, section: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """Run a dashboard section query in a dedicated session, waiting for a free slot first"""
+        async with self._sessions:
+            async with AsyncSessionLocal() as session:
+                return await section(session)
+    
     async def _get_summary_stats(self, db: AsyncSession) -> SummaryStats:
         """Get high-level summary statistics"""
         
@@ -106,70 +141,45 @@ class DashboardService:
         last_month_start = (month_start - timedelta(days=1)).replace(day=1)
         year_start = today_start.replace(month=1, day=1)
         
-        # Sales amounts
-        sales_today = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-            .where(and_(
-                Order.status == OrderStatus.DELIVERED,
-                Order.created_at >= today_start
-            ))
-        ) or 0.0
-        
-        sales_this_week = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-            .where(and_(
-                Order.status == OrderStatus.DELIVERED,
-                Order.created_at >= week_start
-            ))
-        ) or 0.0
-        
-        sales_this_month = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-            .where(and_(
-                Order.status == OrderStatus.DELIVERED,
-                Order.created_at >= month_start
-            ))
-        ) or 0.0
-        
-        sales_last_month = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-            .where(and_(
-                Order.status == OrderStatus.DELIVERED,
-                Order.created_at >= last_month_start,
-                Order.created_at < month_start
-            ))
-        ) or 0.0
-        
-        sales_year_to_date = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-            .where(and_(
-                Order.status == OrderStatus.DELIVERED,
-                Order.created_at >= year_start
-            ))
-        ) or 0.0
+        # Sales amounts and order counts in one pass over the orders since the earliest window start,
+        # so the (status, created_at) indexes bound the scan instead of reading every order
+        window_start = min(year_start, last_month_start)
+        delivered = Order.status == OrderStatus.DELIVERED
         
-        # Order counts
-        orders_today = await db.scalar(
-            select(func.count(Order.id))
-            .where(Order.created_at >= today_start)
-        ) or 0
+        def delivered_sales(*date_filter):
+            return func.coalesce(func.sum(case((and_(delivered, *date_filter), Order.total), else_=0)), 0)
         
-        orders_this_week = await db.scalar(
-            select(func.count(Order.id))
-            .where(Order.created_at >= week_start)
-        ) or 0
+        def orders_since(start):
+            return func.count(case((Order.created_at >= start, Order.id)))
         
-        orders_this_month = await db.scalar(
-            select(func.count(Order.id))
-            .where(Order.created_at >= month_start)
-        ) or 0
+        sales = (await db.execute(
+            select(
+                delivered_sales(Order.created_at >= today_start).label("today"),
+                delivered_sales(Order.created_at >= week_start).label("this_week"),
+                delivered_sales(Order.created_at >= month_start).label("this_month"),
+                delivered_sales(Order.created_at >= last_month_start, Order.created_at < month_start).label("last_month"),
+                delivered_sales(Order.created_at >= year_start).label("year_to_date"),
+                orders_since(today_start).label("orders_today"),
+                orders_since(week_start).label("orders_this_week"),
+                orders_since(month_start).label("orders_this_month")
+            )
+            .where(Order.created_at >= window_start)
+        )).one()
         
-        # Average order value
+        # The average order value covers all delivered orders, so it is its own indexed query
         avg_order_value = await db.scalar(
-            select(func.coalesce(func.avg(Order.total), 0))
-            .where(Order.status == OrderStatus.DELIVERED)
+            select(func.coalesce(func.avg(Order.total), 0)).where(delivered)
         ) or 0.0
         
+        sales_today = sales.today or 0.0
+        sales_this_week = sales.this_week or 0.0
+        sales_this_month = sales.this_month or 0.0
+        sales_last_month = sales.last_month or 0.0
+        sales_year_to_date = sales.year_to_date or 0.0
+        orders_today = sales.orders_today or 0
+        orders_this_week = sales.orders_this_week or 0
+        orders_this_month = sales.orders_this_month or 0
+        
         # Top selling products
         top_products = await self._get_top_selling_products(db)
         
@@ -380,18 +390,7 @@ class DashboardService:
     async def _get_order_stats(self, db: AsyncSession) -> OrderStats:
         """Get order statistics"""
         
-        # Order counts by status
-        status_counts = {}
-        for status in OrderStatus:
-            count = await db.scalar(
-                select(func.count(Order.id)).where(Order.status == status)
-            ) or 0
-            status_counts[status.value.lower()] = count
-        
-        # Total order value
-        total_value = await db.scalar(
-            select(func.coalesce(func.sum(Order.total), 0))
-        ) or 0.0
+        total_value, status_counts = await self._get_order_aggregates(db)
         
         # Latest orders
         latest_orders = await self._get_latest_orders(db)
@@ -407,6 +406,29 @@ class DashboardService:
             latest_orders=latest_orders
         )
     
+    async def _get_order_aggregates(self, db: AsyncSession) -> Tuple[float, Dict[str, int]]:
+        """Get the total order value and order counts by status, served from a short-lived snapshot"""
+        
+        if self._order_aggregates is not None and time.monotonic() < self._order_aggregates_expiry:
+            return self._order_aggregates
+        
+        # Order counts by status and total order value in a single scan
+        aggregates = (await db.execute(
+            select(
+                func.coalesce(func.sum(Order.total), 0),
+                *[func.count(case((Order.status == status, Order.id))) for status in OrderStatus]
+            )
+        )).one()
+        total_value = aggregates[0] or 0.0
+        status_counts = {
+            status.value.lower(): count or 0
+            for status, count in zip(OrderStatus, aggregates[1:])
+        }
+        
+        self._order_aggregates = (total_value, status_counts)
+        self._order_aggregates_expiry = time.monotonic() + ORDER_AGGREGATES_TTL
+        return self._order_aggregates
+    
     async def _get_latest_orders(self, db: AsyncSession, limit: int = 10) -> List[LatestOrder]:
         """Get latest orders"""
         
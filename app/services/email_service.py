@@ -1,8 +1,12 @@
+import logging
+
 from fastapi_mail import MessageSchema, MessageType
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from ..mails.send_mail import mail
 
+logger = logging.getLogger(__name__)
+
 
 class EmailService:
 
@@ -58,9 +62,8 @@ class EmailService:
             await mail.send_message(message, template_name=template_name)
             return True
             
-        except Exception as e:
-            # Log the error (consider adding proper logging)
-            print(f"Failed to send email: {str(e)}")
+        except Exception:
+            logger.exception("Failed to send email", extra={"template_name": template_name})
             return False
             
     async def send_order_confirmation(
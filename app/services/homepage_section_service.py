@@ -1,5 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 from sqlalchemy import select, func, delete
 from typing import List, Optional
 
@@ -89,12 +89,25 @@ class HomepageSectionService:
         active_only: bool = True,
         include_products: bool = False
     ) -> List[HomepageSectionResponse]:
-        query = select(HomepageSection)
+        # Only load the section columns rendered by HomepageSectionResponse
+        query = select(HomepageSection).options(
+            load_only(
+                HomepageSection.id,
+                HomepageSection.title,
+                HomepageSection.slug,
+                HomepageSection.description,
+                HomepageSection.display_order,
+                HomepageSection.is_active,
+                HomepageSection.created_at,
+                HomepageSection.updated_at,
+            )
+        )
         
         if active_only:
             query = query.where(HomepageSection.is_active == True)
         
         if include_products:
+            # ProductResponse renders nearly every product column, so load them all
             query = query.options(selectinload(HomepageSection.products))
         
         query = query.order_by(HomepageSection.display_order, HomepageSection.created_at)
@@ -113,13 +126,30 @@ class HomepageSectionService:
         """
         Get all homepage sections for public display with simplified product information
         """
-        query = select(HomepageSection)
+        # Only load the columns rendered by the simplified schemas
+        query = select(HomepageSection).options(
+            load_only(
+                HomepageSection.id,
+                HomepageSection.title,
+                HomepageSection.display_order,
+                HomepageSection.is_active,
+            )
+        )
         
         if active_only:
             query = query.where(HomepageSection.is_active == True)
         
         if include_products:
-            query = query.options(selectinload(HomepageSection.products))
+            query = query.options(
+                selectinload(HomepageSection.products).load_only(
+                    Product.id,
+                    Product.slug,
+                    Product.name,
+                    Product.price,
+                    Product.discounted_price,
+                    Product.images,
+                )
+            )
         
         query = query.order_by(HomepageSection.display_order, HomepageSection.created_at)
         
@@ -236,8 +266,10 @@ class HomepageSectionService:
         section_id: int, 
         product_ids: List[int]
     ) -> HomepageSectionResponse:
-        # Verify section exists
-        await self.get_homepage_section_by_id(db, section_id)
+        # Verify section exists with a single id probe; SQLite does not enforce the FK
+        section_exists = await db.scalar(select(HomepageSection.id).where(HomepageSection.id == section_id))
+        if section_exists is None:
+            raise NotFoundException("Homepage section not found")
         
         # Add products
         await self._add_products_to_section(db, section_id, product_ids)
@@ -251,18 +283,15 @@ class HomepageSectionService:
         section_id: int, 
         product_ids: List[int]
     ) -> HomepageSectionResponse:
-        # Verify section exists
-        await self.get_homepage_section_by_id(db, section_id)
-        
-        # Remove specific products
-        for product_id in product_ids:
+        # Remove specific products; the final fetch raises NotFound if the
+        # section does not exist
+        if product_ids:
             delete_stmt = delete(homepage_section_products).where(
                 (homepage_section_products.c.homepage_section_id == section_id) &
-                (homepage_section_products.c.product_id == product_id)
+                (homepage_section_products.c.product_id.in_(product_ids))
             )
             await db.execute(delete_stmt)
-        
-        await db.commit()
+            await db.commit()
         
         return await self.get_homepage_section_by_id(db, section_id)
     
@@ -272,30 +301,34 @@ class HomepageSectionService:
         section_id: int, 
         product_ids: List[int]
     ):
-        # Verify products exist
-        query = select(Product.id).where(Product.id.in_(product_ids))
-        result = await db.execute(query)
-        existing_product_ids = [row[0] for row in result.all()]
+        # Verify products exist with a single COUNT
+        unique_product_ids = set(product_ids)
+        found = await db.scalar(
+            select(func.count()).select_from(Product).where(Product.id.in_(unique_product_ids))
+        )
         
-        if len(existing_product_ids) != len(product_ids):
-            missing_ids = set(product_ids) - set(existing_product_ids)
+        if found != len(unique_product_ids):
+            # Only fetch the ids when we need to report which ones are missing
+            result = await db.execute(select(Product.id).where(Product.id.in_(unique_product_ids)))
+            missing_ids = unique_product_ids - set(result.scalars().all())
             raise NotFoundException(f"Products not found: {missing_ids}")
         
-        # Add products to section (avoid duplicates)
-        for product_id in product_ids:
-            # Check if already exists
-            check_query = select(homepage_section_products).where(
+        # Add products to section (avoid duplicates), finding existing links in one IN query
+        linked_result = await db.execute(
+            select(homepage_section_products.c.product_id).where(
                 (homepage_section_products.c.homepage_section_id == section_id) &
-                (homepage_section_products.c.product_id == product_id)
+                (homepage_section_products.c.product_id.in_(unique_product_ids))
             )
-            existing = await db.execute(check_query)
-            
-            if not existing.first():
-                insert_stmt = homepage_section_products.insert().values(
-                    homepage_section_id=section_id,
-                    product_id=product_id
-                )
-                await db.execute(insert_stmt)
+        )
+        already_linked = set(linked_result.scalars().all())
+        new_rows = [
+            {"homepage_section_id": section_id, "product_id": product_id}
+            for product_id in dict.fromkeys(product_ids)
+            if product_id not in already_linked
+        ]
+        
+        if new_rows:
+            await db.execute(homepage_section_products.insert(), new_rows)
     
     async def _remove_all_products_from_section(
         self, 
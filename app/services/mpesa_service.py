@@ -1,13 +1,17 @@
 import base64
-import json
 import os
+import random
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, insert, update, exists, and_, case, literal
 import asyncio
 import httpx
+import orjson
+import phonenumbers
+from phonenumbers import PhoneNumberFormat, PhoneNumberType
 
 from ..models.mpesa_transaction import MpesaTransaction, MpesaConfiguration, MpesaCallback
 from ..models.order import Order
@@ -20,113 +24,239 @@ from ..schemas.mpesa import (
     MpesaCallbackResponse,
     TransactionStatusResponse
 )
-from ..enums import MpesaTransactionType, MpesaTransactionStatus
+from ..enums import MpesaTransactionType, MpesaTransactionStatus, OrderStatus, PaymentStatus
 from ..core.config import Settings
+from ..db.database import AsyncSessionLocal
 
 
+SANDBOX_BASE_URL = "https://sandbox.safaricom.co.ke"
+PRODUCTION_BASE_URL = "https://api.safaricom.co.ke"
+
+# Retry policy for transient M-Pesa API failures
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.2  # seconds
+RETRY_MAX_DELAY = 2.0   # seconds
+# Only failures where the request cannot have been processed are retried: STK push is not
+# idempotent, so a read timeout or 504 may already have sent the customer a PIN prompt
+RETRY_STATUS_CODES = frozenset({502, 503})
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+# MpesaTransactionUpdate fields that map onto MpesaTransaction columns
+UPDATABLE_TRANSACTION_FIELDS = frozenset(MpesaTransactionUpdate.model_fields) & frozenset(
+    column.key for column in MpesaTransaction.__table__.columns
+)
+
+# Number types that can receive an STK push
+MOBILE_NUMBER_TYPES = frozenset({PhoneNumberType.MOBILE, PhoneNumberType.FIXED_LINE_OR_MOBILE})
+
+
+def parse_mpesa_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an M-Pesa YYYYMMDDHHMMSS timestamp by slicing instead of strptime"""
+    if not value:
+        return None
+    
+    ts = str(value)
+    if len(ts) != 14 or not ts.isdigit():
+        raise ValueError(f"Invalid M-Pesa timestamp: {ts}")
+    
+    return datetime(
+        int(ts[0:4]), int(ts[4:6]), int(ts[6:8]),
+        int(ts[8:10]), int(ts[10:12]), int(ts[12:14])
+    )
+
+
+@dataclass(frozen=True, slots=True)
 class MpesaConfig:
-    """Configuration class for M-Pesa settings"""
-    def __init__(self):
-        self.environment = os.getenv("MPESA_ENVIRONMENT", "sandbox")
-        self.consumer_key = os.getenv("MPESA_CONSUMER_KEY")
-        self.consumer_secret = os.getenv("MPESA_CONSUMER_SECRET")
-        self.business_short_code = os.getenv("MPESA_BUSINESS_SHORT_CODE")
-        self.lipa_na_mpesa_passkey = os.getenv("MPESA_PASSKEY")
-        self.callback_url = os.getenv("MPESA_CALLBACK_URL")
-        self.business_name = os.getenv("MPESA_BUSINESS_NAME", "Dira Healthcare")
+    """Configuration class for M-Pesa settings, validated once when it is built"""
+    environment: str
+    consumer_key: str
+    consumer_secret: str
+    business_short_code: str
+    lipa_na_mpesa_passkey: str
+    callback_url: str
+    business_name: str
+    
+    # Derived values that stay constant for the process lifetime
+    basic_auth_header: str = field(init=False)
+    base_url: str = field(init=False)
+    oauth_url: str = field(init=False)
+    stkpush_url: str = field(init=False)
+    stkquery_url: str = field(init=False)
+    shortcode_passkey: bytes = field(init=False)  # Prefix of the STK push password
+    
+    def __post_init__(self):
+        credentials = f"{self.consumer_key}:{self.consumer_secret}"
+        object.__setattr__(self, "basic_auth_header", f"Basic {base64.b64encode(credentials.encode()).decode()}")
+        base_url = SANDBOX_BASE_URL if self.environment == "sandbox" else PRODUCTION_BASE_URL
+        object.__setattr__(self, "base_url", base_url)
+        object.__setattr__(self, "oauth_url", f"{base_url}/oauth/v1/generate?grant_type=client_credentials")
+        object.__setattr__(self, "stkpush_url", f"{base_url}/mpesa/stkpush/v1/processrequest")
+        object.__setattr__(self, "stkquery_url", f"{base_url}/mpesa/stkpushquery/v1/query")
+        object.__setattr__(self, "shortcode_passkey", f"{self.business_short_code}{self.lipa_na_mpesa_passkey}".encode())
+    
+    @classmethod
+    def from_env(cls) -> "MpesaConfig":
+        """Build the configuration from environment variables"""
+        env = os.environ
+        required = {
+            "consumer_key": "MPESA_CONSUMER_KEY",
+            "consumer_secret": "MPESA_CONSUMER_SECRET",
+            "business_short_code": "MPESA_BUSINESS_SHORT_CODE",
+            "lipa_na_mpesa_passkey": "MPESA_PASSKEY",
+            "callback_url": "MPESA_CALLBACK_URL",
+        }
         
         # Validate required fields
-        required_fields = [
-            self.consumer_key, self.consumer_secret, self.business_short_code,
-            self.lipa_na_mpesa_passkey, self.callback_url
-        ]
-        
-        if not all(required_fields):
-            missing_fields = []
-            if not self.consumer_key:
-                missing_fields.append("MPESA_CONSUMER_KEY")
-            if not self.consumer_secret:
-                missing_fields.append("MPESA_CONSUMER_SECRET")
-            if not self.business_short_code:
-                missing_fields.append("MPESA_BUSINESS_SHORT_CODE")
-            if not self.lipa_na_mpesa_passkey:
-                missing_fields.append("MPESA_PASSKEY")
-            if not self.callback_url:
-                missing_fields.append("MPESA_CALLBACK_URL")
-                
+        missing_fields = [name for name in required.values() if not env.get(name)]
+        if missing_fields:
             raise ValueError(f"Missing required M-Pesa environment variables: {', '.join(missing_fields)}")
+        
+        return cls(
+            environment=env.get("MPESA_ENVIRONMENT", "sandbox"),
+            business_name=env.get("MPESA_BUSINESS_NAME", "Dira Healthcare"),
+            **{attr: env[name] for attr, name in required.items()}
+        )
+
+
+# Built once at import; left unset when the environment is incomplete so the
+# app can still start, in which case M-Pesa calls report the missing variables
+try:
+    MPESA_CONFIG: Optional[MpesaConfig] = MpesaConfig.from_env()
+except ValueError:
+    MPESA_CONFIG = None
 
 
 class MpesaService:
     def __init__(self):
-        self.sandbox_base_url = "https://sandbox.safaricom.co.ke"
-        self.production_base_url = "https://api.safaricom.co.ke"
-        self._config = None
+        self._config = MPESA_CONFIG
+        
+        # Cached OAuth token; Safaricom tokens are valid for about an hour
+        self._token: Optional[str] = None
+        self._token_expiry: float = 0.0
+        self._token_lock = asyncio.Lock()
+        
+        # Shared HTTP client so connections to Safaricom are kept alive between calls
+        self._http: Optional[httpx.AsyncClient] = None
     
     @property
-    def config(self):
-        """Lazy load configuration"""
+    def config(self) -> MpesaConfig:
+        """M-Pesa configuration; raises if the environment was incomplete at import"""
         if self._config is None:
-            self._config = MpesaConfig()
+            self._config = MpesaConfig.from_env()
         return self._config
     
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """Lazily create the shared, connection-pooled HTTP client"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                headers={"Content-Type": "application/json"},
+                timeout=httpx.Timeout(30.0),
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            )
+        return self._http
+    
+    async def aclose(self) -> None:
+        """Close the shared HTTP client on application shutdown"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
     async def get_access_token(self) -> str:
-        """Generate OAuth access token for M-Pesa API"""
-        base_url = self.sandbox_base_url if self.config.environment == "sandbox" else self.production_base_url
-        
-        # Create credentials
-        credentials = f"{self.config.consumer_key}:{self.config.consumer_secret}"
-        encoded_credentials = base64.b64encode(credentials.encode()).decode()
-        
-        headers = {
-            "Authorization": f"Basic {encoded_credentials}",
-            "Content-Type": "application/json"
-        }
+        """Get a cached OAuth access token, requesting a new one when it is about to expire"""
+        if self._token and time.monotonic() < self._token_expiry - 60:
+            return self._token
         
-        url = f"{base_url}/oauth/v1/generate?grant_type=client_credentials"
+        async with self._token_lock:
+            # Another request may have refreshed the token while we waited
+            if self._token and time.monotonic() < self._token_expiry - 60:
+                return self._token
+            
+            token_data = await self._request_access_token()
+            self._token = token_data["access_token"]
+            self._token_expiry = time.monotonic() + int(token_data.get("expires_in", 3599))
+            
+            return self._token
+    
+    def invalidate_access_token(self) -> None:
+        """Drop the cached access token so the next call requests a new one"""
+        self._token = None
+        self._token_expiry = 0.0
+    
+    async def _request_access_token(self) -> Dict[str, Any]:
+        """Request a new OAuth access token from the M-Pesa API"""
+        headers = {"Authorization": self.config.basic_auth_header}
         
         try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.get(url, headers=headers)
+            response = await self.http.get(self.config.oauth_url, headers=headers)
                 
             if response.status_code == 200:
-                token_data = response.json()
-                return token_data["access_token"]
+                return orjson.loads(response.content)
             else:
                 raise Exception(f"Failed to get access token: {response.text}")
         except httpx.RequestError as e:
             raise Exception(f"Network error getting access token: {str(e)}")
     
-    async def generate_password(self) -> tuple[str, str]:
+    async def _post(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> httpx.Response:
+        """
+        POST a JSON payload to the M-Pesa API.
+
+        Connection failures and 502/503 responses are retried with exponential
+        backoff and jitter; read timeouts, 504s and business-level failures are
+        not, since the request may already have been accepted. A 401 refreshes
+        the cached access token and retries once.
+        """
+        content = orjson.dumps(payload)
+        refreshed_token = False
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            try:
+                response = await self.http.post(url, headers=headers, content=content)
+            except RETRY_EXCEPTIONS:
+                if attempt >= RETRY_ATTEMPTS:
+                    raise
+            else:
+                # The cached token may have been revoked early; retry once with a fresh one
+                if response.status_code == 401 and not refreshed_token:
+                    refreshed_token = True
+                    self.invalidate_access_token()
+                    headers["Authorization"] = f"Bearer {await self.get_access_token()}"
+                    continue
+                
+                if response.status_code not in RETRY_STATUS_CODES or attempt >= RETRY_ATTEMPTS:
+                    return response
+            
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            await asyncio.sleep(delay + random.uniform(0, delay))
+    
+    def generate_password(self) -> tuple[str, str]:
         """Generate timestamp and password for STK Push"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+        # YYYYMMDDHHMMSS, formatted directly rather than through strftime
+        now = datetime.now()
+        timestamp = f"{now.year:04d}{now.month:02d}{now.day:02d}{now.hour:02d}{now.minute:02d}{now.second:02d}"
         
         # Password = Base64(BusinessShortCode + Passkey + Timestamp)
-        password_string = f"{self.config.business_short_code}{self.config.lipa_na_mpesa_passkey}{timestamp}"
-        password = base64.b64encode(password_string.encode()).decode()
+        password = base64.b64encode(self.config.shortcode_passkey + timestamp.encode()).decode()
         
         return timestamp, password
     
     def validate_phone_number(self, phone: str) -> str:
-        """Ensure phone number is in correct format (254XXXXXXXXX)"""
-        import re
-        
-        # Remove any spaces, dashes, or plus signs
-        clean_phone = re.sub(r'[\s\-\+]', '', phone)
-        
-        # Convert 07XX to 2547XX format
-        if clean_phone.startswith('07'):
-            clean_phone = '254' + clean_phone[1:]
-        elif clean_phone.startswith('7'):
-            clean_phone = '254' + clean_phone
-        elif not clean_phone.startswith('254'):
+        """Ensure phone number is a valid Kenyan mobile number in 254XXXXXXXXX format"""
+        try:
+            number = phonenumbers.parse(phone, "KE")
+        except phonenumbers.NumberParseException:
             raise ValueError("Invalid phone number format. Use format: 254XXXXXXXXX")
         
-        # Validate length (should be 12 digits: 254XXXXXXXXX)
-        if len(clean_phone) != 12:
-            raise ValueError("Invalid phone number length. Should be 12 digits: 254XXXXXXXXX")
-            
-        return clean_phone
+        if (
+            not phonenumbers.is_valid_number(number)
+            or phonenumbers.number_type(number) not in MOBILE_NUMBER_TYPES
+        ):
+            raise ValueError("Invalid phone number. Should be a Kenyan mobile number: 254XXXXXXXXX")
+        
+        # E.164 without the leading "+"
+        return phonenumbers.format_number(number, PhoneNumberFormat.E164)[1:]
     
     async def initiate_stk_push(
         self, 
@@ -140,20 +270,44 @@ class MpesaService:
             # Validate phone number
             validated_phone = self.validate_phone_number(request.phone_number)
             
-            # Get access token
-            access_token = await self.get_access_token()
+            transaction_data = MpesaTransactionCreate(
+                phone_number=validated_phone,
+                amount=request.amount,
+                transaction_type=MpesaTransactionType.C2B,
+                order_id=order_id,
+                account_reference=request.account_reference,
+                transaction_desc=request.transaction_desc
+            )
+            
+            # Get access token and create the transaction record concurrently.
+            # The insert runs on its own session since a session can't be shared
+            # between concurrent tasks.
+            access_token, transaction = await asyncio.gather(
+                self.get_access_token(),
+                self._create_transaction_in_new_session(transaction_data),
+                return_exceptions=True
+            )
+            
+            if isinstance(transaction, BaseException):
+                raise transaction
+            
+            if isinstance(access_token, BaseException):
+                await self.update_transaction(
+                    transaction.id,
+                    MpesaTransactionUpdate(
+                        transaction_status=MpesaTransactionStatus.FAILED,
+                        result_desc=str(access_token)[:255]
+                    ),
+                    db
+                )
+                raise access_token
             
             # Generate timestamp and password
-            timestamp, password = await self.generate_password()
+            timestamp, password = self.generate_password()
             
             # Prepare API request
-            base_url = self.sandbox_base_url if self.config.environment == "sandbox" else self.production_base_url
-            url = f"{base_url}/mpesa/stkpush/v1/processrequest"
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+            url = self.config.stkpush_url
+            headers = {"Authorization": f"Bearer {access_token}"}
             
             payload = {
                 "BusinessShortCode": self.config.business_short_code,
@@ -169,23 +323,10 @@ class MpesaService:
                 "TransactionDesc": request.transaction_desc
             }
             
-            # Create transaction record first
-            transaction_data = MpesaTransactionCreate(
-                phone_number=validated_phone,
-                amount=request.amount,
-                transaction_type=MpesaTransactionType.C2B,
-                order_id=order_id,
-                account_reference=request.account_reference,
-                transaction_desc=request.transaction_desc
-            )
-            
-            transaction = await self.create_transaction(transaction_data, db)
-            
             # Make API request
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(url, headers=headers, json=payload)
+            response = await self._post(url, headers, payload)
             
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             
             if response.status_code == 200 and response_data.get("ResponseCode") == "0":
                 # Update transaction with M-Pesa response
@@ -245,15 +386,10 @@ class MpesaService:
         
         try:
             access_token = await self.get_access_token()
-            timestamp, password = await self.generate_password()
+            timestamp, password = self.generate_password()
             
-            base_url = self.sandbox_base_url if self.config.environment == "sandbox" else self.production_base_url
-            url = f"{base_url}/mpesa/stkpushquery/v1/query"
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "Content-Type": "application/json"
-            }
+            url = self.config.stkquery_url
+            headers = {"Authorization": f"Bearer {access_token}"}
             
             payload = {
                 "BusinessShortCode": self.config.business_short_code,
@@ -262,10 +398,9 @@ class MpesaService:
                 "CheckoutRequestID": checkout_request_id
             }
             
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(url, headers=headers, json=payload)
+            response = await self._post(url, headers, payload)
             
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             
             # Update local transaction record
             transaction = await self.get_transaction_by_checkout_id(checkout_request_id, db)
@@ -301,35 +436,111 @@ class MpesaService:
                 "error_code": "SYSTEM_ERROR"
             }
     
+    def _build_callback_record(
+        self, 
+        callback_data: Dict[str, Any], 
+        raw_body: Optional[bytes] = None
+    ) -> MpesaCallback:
+        """Build the raw callback record stored for auditing and debugging"""
+        
+        stk_callback = callback_data.get("Body", {}).get("stkCallback", {})
+        
+        return MpesaCallback(
+            merchant_request_id=stk_callback.get("MerchantRequestID"),
+            checkout_request_id=stk_callback.get("CheckoutRequestID"),
+            callback_data=raw_body.decode() if raw_body is not None else orjson.dumps(callback_data).decode(),
+            result_code=stk_callback.get("ResultCode"),
+            result_desc=stk_callback.get("ResultDesc")
+        )
+    
+    async def persist_callback(
+        self, 
+        callback_data: Dict[str, Any], 
+        db: AsyncSession,
+        raw_body: Optional[bytes] = None
+    ) -> int:
+        """
+        Store the raw M-Pesa callback and return its record ID
+
+        This is all the callback endpoint does before acknowledging, so
+        Safaricom gets a fast response; `finalise_callback` does the rest.
+        """
+        
+        callback_record = self._build_callback_record(callback_data, raw_body)
+        db.add(callback_record)
+        await db.commit()
+        
+        return callback_record.id
+    
+    async def finalise_callback(self, callback_id: int, callback_data: Dict[str, Any]) -> bool:
+        """
+        Background task to apply a stored callback to its transaction and order
+
+        Runs on its own session. Already processed callbacks, and retries of a
+        callback that was already processed, are skipped so redelivery is safe.
+        """
+        
+        async with AsyncSessionLocal() as db:
+            callback_record = await db.get(MpesaCallback, callback_id)
+            
+            if not callback_record:
+                return False
+            
+            if callback_record.processed:
+                return True
+            
+            already_processed = await db.scalar(
+                select(exists().where(
+                    MpesaCallback.checkout_request_id == callback_record.checkout_request_id,
+                    MpesaCallback.processed == True,
+                    MpesaCallback.id != callback_id
+                ))
+            )
+            
+            if already_processed:
+                callback_record.processed = True
+                callback_record.processing_error = "Duplicate callback"
+                await db.commit()
+                return True
+            
+            return await self._apply_callback(callback_record, callback_data, db)
+    
     async def process_callback(
         self, 
         callback_data: Dict[str, Any], 
-        db: AsyncSession
+        db: AsyncSession,
+        raw_body: Optional[bytes] = None
     ) -> bool:
-        """Process M-Pesa STK Push callback"""
+        """
+        Process M-Pesa STK Push callback
+
+        `raw_body` is the request body the callback was parsed from. When
+        given it is stored verbatim instead of re-serializing `callback_data`.
+        """
         
-        callback_record = None
+        callback_record = self._build_callback_record(callback_data, raw_body)
+        db.add(callback_record)
+        
+        return await self._apply_callback(callback_record, callback_data, db)
+    
+    async def _apply_callback(
+        self, 
+        callback_record: MpesaCallback, 
+        callback_data: Dict[str, Any], 
+        db: AsyncSession
+    ) -> bool:
+        """Update the transaction and order from a callback, committing once with the callback record"""
         
         try:
+            raw_callback = callback_record.callback_data
+            
             # Extract callback information
             stk_callback = callback_data.get("Body", {}).get("stkCallback", {})
             
-            merchant_request_id = stk_callback.get("MerchantRequestID")
             checkout_request_id = stk_callback.get("CheckoutRequestID")
             result_code = stk_callback.get("ResultCode")
             result_desc = stk_callback.get("ResultDesc")
             
-            # Store raw callback for debugging
-            callback_record = MpesaCallback(
-                merchant_request_id=merchant_request_id,
-                checkout_request_id=checkout_request_id,
-                callback_data=json.dumps(callback_data),
-                result_code=result_code,
-                result_desc=result_desc
-            )
-            
-            db.add(callback_record)
-            
             # Find the transaction
             transaction = await self.get_transaction_by_checkout_id(checkout_request_id, db)
             
@@ -342,26 +553,16 @@ class MpesaService:
             if result_code == 0:  # Success
                 # Extract transaction details from callback metadata
                 callback_metadata = stk_callback.get("CallbackMetadata", {})
-                items = callback_metadata.get("Item", [])
-                
-                mpesa_receipt_number = None
-                transaction_date = None
-                phone_number = None
-                amount = None
+                metadata = {
+                    item["Name"]: item.get("Value")
+                    for item in callback_metadata.get("Item", [])
+                    if "Name" in item
+                }
                 
-                for item in items:
-                    name = item.get("Name")
-                    value = item.get("Value")
-                    
-                    if name == "MpesaReceiptNumber":
-                        mpesa_receipt_number = value
-                    elif name == "TransactionDate":
-                        if value:
-                            transaction_date = datetime.strptime(str(value), "%Y%m%d%H%M%S")
-                    elif name == "PhoneNumber":
-                        phone_number = value
-                    elif name == "Amount":
-                        amount = float(value) if value else None
+                mpesa_receipt_number = metadata.get("MpesaReceiptNumber")
+                phone_number = metadata.get("PhoneNumber")
+                amount = float(metadata["Amount"]) if metadata.get("Amount") else None
+                transaction_date = parse_mpesa_timestamp(metadata.get("TransactionDate"))
                 
                 # Update transaction
                 update_data = MpesaTransactionUpdate(
@@ -370,37 +571,41 @@ class MpesaService:
                     result_code=result_code,
                     result_desc=result_desc,
                     transaction_date=transaction_date,
-                    stk_callback_response=json.dumps(callback_data)
+                    stk_callback_response=raw_callback
                 )
                 
-                await self.update_transaction(transaction.id, update_data, db)
+                await self.update_transaction(transaction.id, update_data, db, commit=False)
                 
                 # Update order status if applicable
                 if transaction.order_id:
-                    await self._update_order_payment_status(transaction.order_id, True, db)
+                    await self._update_order_payment_status(transaction.order_id, True, db, commit=False)
                 
             else:  # Failed transaction
                 update_data = MpesaTransactionUpdate(
                     transaction_status=MpesaTransactionStatus.FAILED,
                     result_code=result_code,
                     result_desc=result_desc,
-                    stk_callback_response=json.dumps(callback_data)
+                    stk_callback_response=raw_callback
                 )
                 
-                await self.update_transaction(transaction.id, update_data, db)
+                await self.update_transaction(transaction.id, update_data, db, commit=False)
                 
                 # Update order status if applicable
                 if transaction.order_id:
-                    await self._update_order_payment_status(transaction.order_id, False, db)
+                    await self._update_order_payment_status(transaction.order_id, False, db, commit=False)
             
+            # Callback record, transaction and order changes are committed together
             callback_record.processed = True
             await db.commit()
             return True
             
         except Exception as e:
-            if callback_record:
-                callback_record.processing_error = str(e)
-                await db.commit()
+            # Discard the partial transaction/order updates but keep the raw callback
+            await db.rollback()
+            callback_record.processed = False
+            callback_record.processing_error = str(e)
+            db.add(callback_record)
+            await db.commit()
             return False
     
     async def create_transaction(
@@ -410,7 +615,8 @@ class MpesaService:
     ) -> MpesaTransaction:
         """Create a new M-Pesa transaction record"""
         
-        transaction = MpesaTransaction(
+        # Single INSERT ... RETURNING instead of add + commit + refresh
+        stmt = insert(MpesaTransaction).values(
             phone_number=transaction_data.phone_number,
             amount=transaction_data.amount,
             transaction_type=transaction_data.transaction_type.value,
@@ -418,36 +624,59 @@ class MpesaService:
             account_reference=transaction_data.account_reference,
             transaction_desc=transaction_data.transaction_desc,
             transaction_status=MpesaTransactionStatus.PENDING.value
-        )
+        ).returning(MpesaTransaction)
         
-        db.add(transaction)
+        result = await db.execute(stmt)
+        transaction = result.scalar_one()
         await db.commit()
-        await db.refresh(transaction)
         
         return transaction
     
+    async def _create_transaction_in_new_session(
+        self, 
+        transaction_data: MpesaTransactionCreate
+    ) -> MpesaTransaction:
+        """Create a transaction record on a dedicated session so it can run alongside other IO"""
+        
+        async with AsyncSessionLocal() as session:
+            return await self.create_transaction(transaction_data, session)
+    
     async def update_transaction(
         self, 
         transaction_id: int, 
         update_data: MpesaTransactionUpdate, 
-        db: AsyncSession
+        db: AsyncSession,
+        commit: bool = True
     ) -> Optional[MpesaTransaction]:
-        """Update an existing M-Pesa transaction"""
+        """
+        Update an existing M-Pesa transaction
+
+        Pass `commit=False` to leave the change in the caller's transaction.
+        """
         
-        query = select(MpesaTransaction).where(MpesaTransaction.id == transaction_id)
-        result = await db.execute(query)
-        transaction = result.scalar_one_or_none()
+        values = {
+            field: value
+            for field in update_data.model_fields_set & UPDATABLE_TRANSACTION_FIELDS
+            if (value := getattr(update_data, field)) is not None
+        }
         
-        if not transaction:
-            return None
+        # Nothing to change: skip the UPDATE and commit entirely
+        if not values:
+            return await self.get_transaction_by_id(transaction_id, db)
         
-        # Update fields
-        for field, value in update_data.model_dump(exclude_unset=True).items():
-            if hasattr(transaction, field) and value is not None:
-                setattr(transaction, field, value)
+        # Single UPDATE ... RETURNING instead of SELECT + setattr + refresh
+        stmt = (
+            update(MpesaTransaction)
+            .where(MpesaTransaction.id == transaction_id)
+            .values(**values)
+            .returning(MpesaTransaction)
+            .execution_options(populate_existing=True)
+        )
+        result = await db.execute(stmt)
+        transaction = result.scalar_one_or_none()
         
-        await db.commit()
-        await db.refresh(transaction)
+        if commit:
+            await db.commit()
         
         return transaction
     
@@ -486,26 +715,42 @@ class MpesaService:
         result = await db.execute(query)
         return list(result.scalars().all())
     
+    async def get_configuration(
+        self, 
+        db: AsyncSession
+    ) -> Optional[MpesaConfiguration]:
+        """Get the active M-Pesa configuration"""
+        
+        query = select(MpesaConfiguration).where(
+            MpesaConfiguration.is_active == True
+        ).order_by(MpesaConfiguration.id.desc()).limit(1)
+        result = await db.execute(query)
+        return result.scalar_one_or_none()
+    
     async def _update_order_payment_status(
         self, 
         order_id: int, 
         paid: bool, 
-        db: AsyncSession
+        db: AsyncSession,
+        commit: bool = True
     ):
         """Update order payment status based on M-Pesa transaction"""
         
-        query = select(Order).where(Order.id == order_id)
-        result = await db.execute(query)
-        order = result.scalar_one_or_none()
-        
-        if order:
-            if paid:
-                # Update order status to confirmed/paid
-                from ..enums import OrderStatus
-                order.status = OrderStatus.CONFIRMED
-            # Additional order status logic can be added here
-            
-            await db.commit()
+        if paid:
+            # Mark the order paid in a single UPDATE; a pending order moves on to processing,
+            # an order an admin has already advanced keeps its status
+            await db.execute(
+                update(Order).where(Order.id == order_id).values(
+                    payment_status=PaymentStatus.COMPLETED,
+                    status=case(
+                        (Order.status == OrderStatus.PENDING, literal(OrderStatus.PROCESSING, Order.status.type)),
+                        else_=Order.status
+                    )
+                )
+            )
+            if commit:
+                await db.commit()
+        # Additional order status logic can be added here
 
 
 # Create service instance
@@ -1,14 +1,21 @@
-import uuid
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List, Tuple
+import logging
+from time import monotonic
+from enum import Enum
+from contextlib import asynccontextmanager
+from secrets import token_hex
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 
 from fastapi import BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_, func, delete
+from sqlalchemy.orm import selectinload, joinedload, load_only
+from sqlalchemy import and_, or_, func, delete, insert, update, case, tuple_, Row
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from ..models import Cart, CartItem, CartServiceItem, Order, OrderItem, OrderService as OrderServiceModel
-from ..models import OrderStatusHistory
+from ..models import OrderStatusHistory, OrderNote
 from ..models import PaymentTransaction
 from ..models import OrderCancellation
 from ..models import Refund
@@ -22,16 +29,87 @@ from ..services.email_service import EmailService
 from ..core.config import Config
 from ..core.dependencies import get_db
 
+logger = logging.getLogger(__name__)
+
+# Seconds a notified order's customer email is reused by later notifications for the same order
+NOTIFICATION_CUSTOMER_TTL = 30
+
+
+# Shipment tracking fields updated from tracking_data, and the subset also stored on the order
+TRACKING_FIELDS = ("status", "location", "carrier", "estimated_delivery", "tracking_number")
+ORDER_TRACKING_FIELDS = frozenset({"estimated_delivery", "tracking_number"})
+
+# Default checkpoint (location, description) for statuses that emit tracking on a status change
+TRACKING_TEMPLATES = {
+    OrderStatus.SHIPPED: ("Distribution center", "Order {status}"),
+    OrderStatus.DELIVERED: ("Delivery address", "Order delivered to customer"),
+    OrderStatus.PROCESSING: ("Warehouse", "Order is being prepared for shipment"),
+}
+
+# Plain status values used in status-change notes
+ORDER_STATUS_LABELS = {status: status.value for status in OrderStatus}
+
+# Columns the admin order listing may be sorted by
+SORTABLE_ORDER_COLUMNS = {
+    "id": Order.id,
+    "order_number": Order.order_number,
+    "status": Order.status,
+    "payment_status": Order.payment_status,
+    "total": Order.total,
+    "created_at": Order.created_at,
+    "updated_at": Order.updated_at,
+}
+
+# Order columns rendered by OrderResponse; list endpoints skip the address/notes payload
+ORDER_LIST_COLUMNS = (
+    Order.id, Order.order_number, Order.customer_id, Order.status, Order.payment_method,
+    Order.payment_status, Order.subtotal, Order.tax, Order.shipping_cost, Order.discount,
+    Order.total, Order.created_at, Order.updated_at
+)
+
+# Shared across notifications; EmailService holds no per-message state
+email_service = EmailService()
+
+
+def _enum_value(value: Any) -> Any:
+    """Plain value of an enum member; strings and None pass through unchanged"""
+    return value.value if isinstance(value, Enum) else value
+
+# order_id -> (expiry, customer email) shared by the confirmation and status notifications
+_notification_customers: Dict[int, Tuple[float, str]] = {}
+
 
 class OrderService:
+    @asynccontextmanager
+    async def _transactional(self, db: AsyncSession, action: str):
+        """Roll back on error, re-raise intentional HTTP exceptions and wrap anything else"""
+        try:
+            yield
+        except (NotFoundException, BadRequestException):
+            await db.rollback()
+            raise
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Failed to %s", action, extra={"action": action})
+            raise BadRequestException(f"Failed to {action}: {str(e)}")
+
     def _convert_to_naive_datetime(self, dt: datetime) -> datetime:
-        """Convert timezone-aware datetime to timezone-naive datetime"""
-        if dt is None:
-            return None
-        if dt.tzinfo is not None:
-            # Convert to naive datetime by removing timezone info
-            return dt.replace(tzinfo=None)
-        return dt
+        """Convert timezone-aware datetime to a timezone-naive UTC datetime"""
+        if dt is None or dt.tzinfo is None:
+            return dt
+        # Normalize to UTC before dropping the offset so the wall-clock time isn't shifted
+        return dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _format_order_notes(self, order: Order) -> Optional[str]:
+        """Render legacy notes text followed by OrderNote rows as one notes string"""
+        entries = []
+        if order.notes and order.notes.strip() and not order.notes.startswith("string"):
+            entries.append(order.notes)
+        entries.extend(
+            f"[{note.created_at.strftime('%Y-%m-%d %H:%M')}] {note.body}"
+            for note in order.note_entries
+        )
+        return "\n\n".join(entries) or order.notes
 
     async def _get_user_by_id(self, user_id: int, db: AsyncSession) -> User:
         """Get user by ID"""
@@ -48,41 +126,45 @@ class OrderService:
         background_tasks: BackgroundTasks
     ) -> Order:
         """Create a new order from the user's cart"""
-        try:
-            # Get user's cart
-            query = select(Cart).where(Cart.customer_id == user_id)
-            result = await db.execute(query)
-            cart = result.scalars().first()
+        async with self._transactional(db, "create order"):
+            # Get user's cart with its items, services, products and services eagerly loaded
+            query = (
+                select(Cart)
+                .where(Cart.customer_id == user_id)
+                .options(
+                    selectinload(Cart.cart_items).selectinload(CartItem.product),
+                    selectinload(Cart.cart_service_items).selectinload(CartServiceItem.service)
+                )
+            )
+            cart = await db.scalar(query)
             
             if not cart:
                 raise NotFoundException("Shopping cart not found")
                 
             # Check if cart is empty
-            cart_items_query = select(CartItem).where(CartItem.cart_id == cart.id)
-            cart_items_result = await db.execute(cart_items_query)
-            cart_items = cart_items_result.scalars().all()
-            
-            cart_services_query = select(CartServiceItem).where(CartServiceItem.cart_id == cart.id)
-            cart_services_result = await db.execute(cart_services_query)
-            cart_services = cart_services_result.scalars().all()
+            cart_items = list(cart.cart_items)
+            cart_services = list(cart.cart_service_items)
             
             if not cart_items and not cart_services:
                 raise BadRequestException("Your cart is empty")
                 
+            # Index the eagerly loaded products and services
+            products_by_id = {item.product_id: item.product for item in cart_items if item.product}
+            services_by_id = {
+                service_item.service_id: service_item.service
+                for service_item in cart_services if service_item.service
+            }
+            
             # Calculate order totals
             subtotal = 0.0
             tax = 0.0
             
             # Calculate product subtotal
             for item in cart_items:
-                product = await db.get(Product, item.product_id)
+                product = products_by_id.get(item.product_id)
                 if not product:
                     raise NotFoundException(f"Product with ID {item.product_id} not found")
                     
-                # Check stock
-                if product.stock < item.quantity:
-                    raise BadRequestException(f"Not enough stock for {product.name}. Only {product.stock} available")
-                    
                 # Add to subtotal
                 subtotal += product.price * item.quantity
                 # Calculate tax
@@ -90,13 +172,35 @@ class OrderService:
                 
             # Calculate service subtotal
             for service_item in cart_services:
-                service = await db.get(Service, service_item.service_id)
+                service = services_by_id.get(service_item.service_id)
                 if not service:
                     raise NotFoundException(f"Service with ID {service_item.service_id} not found")
                     
                 # Add to subtotal
                 subtotal += service.price
                 
+            # Reserve stock atomically: the guarded UPDATE only touches products that still
+            # have enough stock, so concurrent checkouts cannot oversell
+            ordered_quantities = {}
+            for item in cart_items:
+                ordered_quantities[item.product_id] = ordered_quantities.get(item.product_id, 0) + item.quantity
+            if ordered_quantities:
+                ordered_quantity = case(ordered_quantities, value=Product.id)
+                stock_result = await db.execute(
+                    update(Product)
+                    .where(Product.id.in_(ordered_quantities), Product.stock >= ordered_quantity)
+                    .values(stock=Product.stock - ordered_quantity)
+                    .returning(Product.id)
+                    .execution_options(synchronize_session=False)
+                )
+                reserved_ids = set(stock_result.scalars().all())
+                if len(reserved_ids) < len(ordered_quantities):
+                    product = next(
+                        products_by_id[product_id] for product_id in ordered_quantities
+                        if product_id not in reserved_ids
+                    )
+                    raise BadRequestException(f"Not enough stock for {product.name}. Only {product.stock} available")
+                
             # Apply discount from cart if any
             discount = cart.discount_amount if cart.discount_amount else 0.0
             
@@ -108,7 +212,7 @@ class OrderService:
             
             # Create order
             new_order = Order(
-                order_number=f"ORDER-{uuid.uuid4().hex[:8].upper()}",
+                order_number=f"ORDER-{token_hex(5).upper()}",
                 customer_id=user_id,
                 status=OrderStatus.PROCESSING if order_data.payment_method == PaymentMethod.CASH_ON_DELIVERY else OrderStatus.PENDING,
                 shipping_address=order_data.shipping_address,
@@ -124,55 +228,61 @@ class OrderService:
                 total=total,
                 notes=order_data.notes,
                 prescription_id=order_data.prescription_id,
-                requires_verification=any(getattr(item.product, 'requires_prescription', False) for item in cart_items)
+                requires_verification=any(product.requires_prescription for product in products_by_id.values())
             )
             
             db.add(new_order)
             await db.flush()  # Get the order ID without committing
             
-            # Create order items
+            # Create order items in one batched INSERT
+            order_item_rows = []
             for item in cart_items:
-                product = await db.get(Product, item.product_id)
+                product = products_by_id[item.product_id]
+                order_item_rows.append({
+                    "order_id": new_order.id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "price": product.price,
+                    "discount": 0  # Could calculate individual discounts if needed
+                })
                 
-                # Create order item
-                order_item = OrderItem(
-                    order_id=new_order.id,
-                    product_id=item.product_id,
-                    quantity=item.quantity,
-                    price=product.price,
-                    discount=0  # Could calculate individual discounts if needed
+            if order_item_rows:
+                await db.execute(insert(OrderItem), order_item_rows)
+                
+            # Create appointments for services with appointment details in one batched INSERT
+            appointment_services = [service_item for service_item in cart_services if service_item.appointment_details]
+            appointment_ids = {}
+            if appointment_services:
+                # Create appointment logic would go here
+                # This is simplified
+                appointment_result = await db.execute(
+                    insert(Appointment).returning(Appointment.id, sort_by_parameter_order=True),
+                    [
+                        {
+                            "service_id": service_item.service_id,
+                            "customer_id": user_id,
+                            # Map other appointment details
+                        }
+                        for service_item in appointment_services
+                    ]
                 )
-                db.add(order_item)
-                
-                # Update product stock
-                product.stock -= item.quantity
-                
-            # Create order services
-            for service_item in cart_services:
-                service = await db.get(Service, service_item.service_id)
+                appointment_ids = {
+                    service_item.id: appointment_id
+                    for service_item, appointment_id in zip(appointment_services, appointment_result.scalars().all())
+                }
                 
-                # Create appointment if details provided
-                appointment_id = None
-                if service_item.appointment_details:
-                    # Create appointment logic would go here
-                    # This is simplified
-                    appointment = Appointment(
-                        service_id=service_item.service_id,
-                        customer_id=user_id,
-                        # Map other appointment details
-                    )
-                    db.add(appointment)
-                    await db.flush()
-                    appointment_id = appointment.id
-                    
-                # Create order service
-                order_service_entry = OrderServiceModel(
-                    order_id=new_order.id,
-                    service_id=service_item.service_id,
-                    price=service.price,
-                    appointment_id=appointment_id
-                )
-                db.add(order_service_entry)
+            # Create order services in one batched INSERT
+            order_service_rows = [
+                {
+                    "order_id": new_order.id,
+                    "service_id": service_item.service_id,
+                    "price": services_by_id[service_item.service_id].price,
+                    "appointment_id": appointment_ids.get(service_item.id)
+                }
+                for service_item in cart_services
+            ]
+            if order_service_rows:
+                await db.execute(insert(OrderServiceModel), order_service_rows)
                 
             # Clear the cart
             await db.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
@@ -185,27 +295,12 @@ class OrderService:
             
             # Commit all changes
             await db.commit()
-            await db.refresh(new_order)
             
             # Schedule order confirmation email as a background task
             background_tasks.add_task(self._send_order_confirmation_background, new_order.id)
 
             
             return new_order
-            
-        except Exception as e:
-            # Rollback transaction in case of any error
-            await db.rollback()
-            
-            # Re-raise HTTP exceptions as they are intentional
-            if isinstance(e, (NotFoundException, BadRequestException)):
-                raise
-                
-            # TODO Remove debugging step
-            print(f"Error creating order: {str(e)}")
-            
-            # Raise a generic exception with a user-friendly message
-            raise BadRequestException(f"Failed to create order: {str(e)}")
         
 
     async def _send_order_confirmation_background(self, order_id: int) -> None:
@@ -214,56 +309,53 @@ class OrderService:
         db_generator = get_db()
         db = await anext(db_generator)
         try:
-            order = await self.get_order_by_id(order_id, None, db)
-            customer = await self._get_user_by_id(order.customer_id, db)
-            
-            # Get order items with product details for the email
-            items_query = (
-                select(OrderItem, Product)
-                .join(Product)
-                .where(OrderItem.order_id == order_id)
-            )
-            items_result = await db.execute(items_query)
-            items_data = items_result.all()
-            
-            # Get order services with service details
-            services_query = (
-                select(OrderServiceModel, Service)
-                .join(Service)
-                .where(OrderServiceModel.order_id == order_id)
+            # Load the order, its items/products and services in one eager-loaded query
+            query = (
+                select(Order)
+                .where(Order.id == order_id)
+                .options(
+                    selectinload(Order.items).joinedload(OrderItem.product),
+                    selectinload(Order.services).joinedload(OrderServiceModel.service)
+                )
             )
-            services_result = await db.execute(services_query)
-            services_data = services_result.all()
+            order = await db.scalar(query)
+            if not order:
+                raise NotFoundException(f"Order with ID {order_id} not found")
+            email = await self._get_notification_email(order, db)
+            if not email:
+                return
             
             # Format items for email template
-            items = []
-            for item, product in items_data:
-                items.append({
-                    "name": product.name,
+            items = [
+                {
+                    "name": item.product.name,
                     "quantity": item.quantity,
                     "price": item.price,
                     "total": item.price * item.quantity - item.discount
-                })
+                }
+                for item in order.items if item.product is not None
+            ]
             
             # Format services for email template
-            services = []
-            for service_item, service in services_data:
-                services.append({
-                    "name": service.name,
+            services = [
+                {
+                    "name": service_item.service.name,
                     "price": service_item.price
-                })
+                }
+                for service_item in order.services if service_item.service is not None
+            ]
             
             order_data = {
                 "id": order.id,
                 "order_number": order.order_number,
-                "status": order.status.value if hasattr(order.status, 'value') else str(order.status),
-                "customer_name": getattr(customer, 'full_name', customer.email),
+                "status": _enum_value(order.status),
+                "customer_name": email,
                 "subtotal": order.subtotal,
                 "tax": order.tax,
                 "shipping_cost": order.shipping_cost,
                 "discount": order.discount,
                 "total": order.total,
-                "payment_method": order.payment_method.value if hasattr(order.payment_method, 'value') else str(order.payment_method),
+                "payment_method": _enum_value(order.payment_method),
                 "shipping_address": order.shipping_address,
                 "items": items,
                 "services": services,
@@ -273,22 +365,24 @@ class OrderService:
             }
             
             # Send email
-            email_service = EmailService()
             await email_service.send_order_confirmation_email(
-                to_email=customer.email,
+                to_email=email,
                 order_data=order_data,
-                customer_name=getattr(customer, 'full_name', 'Valued Customer')
+                customer_name='Valued Customer'
             )
             
         except Exception as e:
-            print(f"Background order confirmation email error: {str(e)}")
+            logger.exception("Background order confirmation email error")
         finally:
             await db.close()    
 
-    async def get_order_by_id(self, order_id: int, user_id: Optional[int], db: AsyncSession) -> Order:
+    async def get_order_by_id(
+        self, order_id: int, user_id: Optional[int], db: AsyncSession, for_update: bool = False
+    ) -> Order:
         """
         Get order by ID
         If user_id is provided, ensure the order belongs to that user
+        If for_update is set, lock the row until the surrounding transaction ends
         """
         try:
             query = select(Order).where(Order.id == order_id)
@@ -296,9 +390,11 @@ class OrderService:
             # If user_id is provided, check ownership
             if user_id is not None:
                 query = query.where(Order.customer_id == user_id)
+            
+            if for_update:
+                query = query.with_for_update()
                 
-            result = await db.execute(query)
-            order = result.scalars().first()
+            order = await db.scalar(query)
             
             if not order:
                 raise NotFoundException(f"Order with ID {order_id} not found")
@@ -311,7 +407,7 @@ class OrderService:
                 raise
                 
             # Log the error
-            print(f"Error retrieving order: {str(e)}")
+            logger.exception("Error retrieving order")
             
             # Raise a generic exception with a user-friendly message
             raise BadRequestException(f"Failed to retrieve order: {str(e)}")
@@ -327,69 +423,94 @@ class OrderService:
         try:
             query = (
                 select(Order)
+                .options(load_only(*ORDER_LIST_COLUMNS))
                 .where(Order.customer_id == user_id)
                 .order_by(Order.created_at.desc())
                 .offset(skip)
                 .limit(limit)
             )
             
-            result = await db.execute(query)
-            orders = result.scalars().all()
+            orders = (await db.scalars(query)).all()
             
             return orders
             
         except Exception as e:
             # Log the error
-            print(f"Error retrieving user orders: {str(e)}")
+            logger.exception("Error retrieving user orders")
             
             # Raise a generic exception with a user-friendly message
             raise BadRequestException(f"Failed to retrieve orders: {str(e)}")
 
+    async def stream_user_order_summaries(
+        self,
+        user_id: int,
+        db: AsyncSession,
+        limit: int = 1000,
+        batch_size: int = 500
+    ) -> AsyncIterator[Row]:
+        """
+        Stream a user's orders newest first as lightweight (id, order_number, status, total, created_at)
+        rows, fetched from the server in batches instead of materialising the full list
+        """
+        query = (
+            select(Order.id, Order.order_number, Order.status, Order.total, Order.created_at)
+            .where(Order.customer_id == user_id)
+            .order_by(Order.created_at.desc())
+            .limit(limit)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            for row in partition:
+                yield row
+
     async def get_order_detail(self, order_id: int, user_id: int, db: AsyncSession) -> Dict[str, Any]:
         """Get detailed order information including items and services"""
         try:
-            order = await self.get_order_by_id(order_id, user_id, db)
-            
-            # Get order items with product details
-            items_query = (
-                select(OrderItem, Product)
-                .join(Product)
-                .where(OrderItem.order_id == order_id)
-            )
-            items_result = await db.execute(items_query)
-            items_data = items_result.all()
-            
-            # Get order services with service details
-            services_query = (
-                select(OrderServiceModel, Service)
-                .join(Service)
-                .where(OrderServiceModel.order_id == order_id)
+            # Load the order with its items/products and services in one eager-loaded query
+            query = (
+                select(Order)
+                .where(Order.id == order_id)
+                .options(
+                    selectinload(Order.items).joinedload(OrderItem.product),
+                    selectinload(Order.services).joinedload(OrderServiceModel.service),
+                    selectinload(Order.note_entries)
+                )
             )
-            services_result = await db.execute(services_query)
-            services_data = services_result.all()
+            
+            # If user_id is provided, check ownership
+            if user_id is not None:
+                query = query.where(Order.customer_id == user_id)
+                
+            order = await db.scalar(query)
+            
+            if not order:
+                raise NotFoundException(f"Order with ID {order_id} not found")
             
             # Prepare response format
-            items = []
-            for item, product in items_data:
-                items.append({
+            items = [
+                {
                     "id": item.id,
-                    "product_id": product.id,
-                    "product_name": product.name,
+                    "product_id": item.product.id,
+                    "product_name": item.product.name,
                     "quantity": item.quantity,
                     "price": item.price,
                     "discount": item.discount,
                     "total": item.price * item.quantity - item.discount
-                })
+                }
+                for item in order.items if item.product is not None
+            ]
             
-            services = []
-            for service_item, service in services_data:
-                services.append({
+            services = [
+                {
                     "id": service_item.id,
-                    "service_id": service.id,
-                    "service_name": service.name,
+                    "service_id": service_item.service.id,
+                    "service_name": service_item.service.name,
                     "price": service_item.price,
                     "appointment_id": service_item.appointment_id
-                })
+                }
+                for service_item in order.services if service_item.service is not None
+            ]
             
             # Format order details
             order_detail = {
@@ -408,7 +529,7 @@ class OrderService:
                 "total": order.total,
                 "items": items,
                 "services": services,
-                "notes": order.notes,
+                "notes": self._format_order_notes(order),
                 "tracking_number": order.tracking_number,
                 "estimated_delivery": order.estimated_delivery,
                 "created_at": order.created_at,
@@ -423,7 +544,7 @@ class OrderService:
                 raise
                 
             # Log the error
-            print(f"Error retrieving order details: {str(e)}")
+            logger.exception("Error retrieving order details")
             
             # Raise a generic exception with a user-friendly message
             raise BadRequestException(f"Failed to retrieve order details: {str(e)}")
@@ -440,11 +561,16 @@ class OrderService:
         date_from: Optional[str] = None,
         date_to: Optional[str] = None,
         sort_by: str = "created_at",
-        sort_order: str = "desc"
+        sort_order: str = "desc",
+        after: Optional[Tuple[datetime, int]] = None
     ) -> List[Order]:
-        """Get all orders in the system with filtering (Admin only)"""
+        """
+        Get all orders in the system with filtering (Admin only)
+        When sorting by created_at, pass the (created_at, id) of the last order seen as `after`
+        to seek straight to the next page instead of skipping rows with OFFSET
+        """
         try:
-            query = select(Order)
+            query = select(Order).options(load_only(*ORDER_LIST_COLUMNS))
             
             # Apply filters
             if status_filter:
@@ -458,61 +584,58 @@ class OrderService:
             
             if date_from:
                 try:
-                    from_date = datetime.strptime(date_from, "%Y-%m-%d")
+                    from_date = datetime.combine(date.fromisoformat(date_from), time.min)
                     query = query.where(Order.created_at >= from_date)
                 except ValueError:
                     pass  # Invalid date format, ignore filter
             
             if date_to:
                 try:
-                    to_date = datetime.strptime(date_to, "%Y-%m-%d")
+                    to_date = datetime.combine(date.fromisoformat(date_to), time.min)
                     # Add 1 day to include the entire end date
                     to_date = to_date + timedelta(days=1)
                     query = query.where(Order.created_at < to_date)
                 except ValueError:
                     pass  # Invalid date format, ignore filter
             
-            # Apply sorting
-            if hasattr(Order, sort_by):
-                order_field = getattr(Order, sort_by)
-                if sort_order.lower() == "desc":
-                    query = query.order_by(order_field.desc())
+            descending = sort_order.lower() == "desc"
+            
+            if after is not None and sort_by == "created_at":
+                # Keyset pagination on (created_at, id), served by ix_orders_created_at_id
+                keyset = tuple_(Order.created_at, Order.id)
+                query = query.where(keyset < after if descending else keyset > after)
+                if descending:
+                    query = query.order_by(Order.created_at.desc(), Order.id.desc())
                 else:
-                    query = query.order_by(order_field.asc())
+                    query = query.order_by(Order.created_at.asc(), Order.id.asc())
+                query = query.limit(limit)
             else:
-                # Default sorting
-                query = query.order_by(Order.created_at.desc())
-            
-            # Apply pagination
-            query = query.offset(skip).limit(limit)
+                # Apply sorting; unknown fields fall back to created_at
+                order_field = SORTABLE_ORDER_COLUMNS.get(sort_by, Order.created_at)
+                if descending:
+                    query = query.order_by(order_field.desc(), Order.id.desc())
+                else:
+                    query = query.order_by(order_field.asc(), Order.id.asc())
+                
+                # Apply pagination
+                query = query.offset(skip).limit(limit)
             
-            result = await db.execute(query)
-            orders = result.scalars().all()
+            orders = (await db.scalars(query)).all()
             
             return orders
             
         except Exception as e:
-            print(f"Error retrieving all orders: {str(e)}")
+            logger.exception("Error retrieving all orders")
             raise BadRequestException(f"Failed to retrieve orders: {str(e)}")
 
     async def get_order_by_id_admin(self, order_id: int, db: AsyncSession) -> Order:
         """Get order by ID with admin privileges (no user ownership check)"""
-        try:
-            query = select(Order).where(Order.id == order_id)
-            result = await db.execute(query)
-            order = result.scalars().first()
-            
-            if not order:
-                raise NotFoundException(f"Order with ID {order_id} not found")
-            
-            return order
-            
-        except NotFoundException:
-            raise
-        except Exception as e:
-            print(f"Error retrieving order by ID: {str(e)}")
-            raise BadRequestException(f"Failed to retrieve order: {str(e)}")
-            raise BadRequestException(f"Failed to retrieve order details: {str(e)}")
+        order = await db.scalar(select(Order).where(Order.id == order_id))
+        
+        if not order:
+            raise NotFoundException(f"Order with ID {order_id} not found")
+        
+        return order
 
     async def update_order_status(
         self, 
@@ -520,48 +643,36 @@ class OrderService:
         status: OrderStatus, 
         admin_id: int,
         db: AsyncSession,
+        background_tasks: BackgroundTasks,
         notes: Optional[str] = None,
-        location: Optional[str] = None,
-        background_tasks: BackgroundTasks = None
+        location: Optional[str] = None
     ) -> Order:
         """Update an order's status (admin function)"""
-        try:
-            order = await self.get_order_by_id(order_id, None, db)
+        async with self._transactional(db, "update order status"):
+            # Lock the order so concurrent admin updates serialize instead of overwriting each other
+            order = await self.get_order_by_id(order_id, None, db, for_update=True)
             
             # Record previous status for history
             previous_status = order.status
             
-            # Format timestamp in a cleaner way
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            # Re-submitting the current status without a note changes nothing; just release the lock
+            if previous_status == status and (not notes or not notes.strip() or notes == "string"):
+                await db.commit()
+                return order
+            
+            # Read the clock once so the note row and tracking checkpoint agree
+            now = datetime.now()
             
             # Check if status is actually changing
             if previous_status == status:
-                # If status isn't changing but there are notes, add them
-                if notes and notes.strip():
-                    new_note = f"[{timestamp}] Note: {notes}"
-                    
-                    # If there are existing notes, append with separation
-                    if order.notes and order.notes.strip() and not order.notes.startswith("string"):
-                        order.notes = f"{order.notes}\n\n{new_note}"
-                    else:
-                        # If notes are empty or just "string", replace entirely
-                        order.notes = new_note
+                # Status isn't changing, so only the note is recorded
+                db.add(OrderNote(order_id=order_id, author_id=admin_id, body=f"Note: {notes}", created_at=now))
             else:
                 # Update order status
                 order.status = status
                 
-                # Format previous and new status values (remove OrderStatus. prefix)
-                prev_status_str = previous_status.value if hasattr(previous_status, 'value') else str(previous_status)
-                new_status_str = status.value if hasattr(status, 'value') else str(status)
-                
-                if prev_status_str.startswith("OrderStatus."):
-                    prev_status_str = prev_status_str.replace("OrderStatus.", "")
-                    
-                if new_status_str.startswith("OrderStatus."):
-                    new_status_str = new_status_str.replace("OrderStatus.", "")
-                
                 # Create status change entry
-                status_note = f"[{timestamp}] Status updated: {prev_status_str} → {new_status_str}"
+                status_note = f"Status updated: {ORDER_STATUS_LABELS[previous_status]} → {ORDER_STATUS_LABELS[status]}"
                 
                 # Add notes if provided
                 if notes and notes.strip():
@@ -574,12 +685,8 @@ class OrderService:
                 else:
                     new_entry = status_note
                 
-                # Update the notes field
-                if order.notes and order.notes.strip() and not order.notes.startswith("string"):
-                    order.notes = f"{order.notes}\n\n{new_entry}"
-                else:
-                    # If notes are empty or just "string", replace entirely
-                    order.notes = new_entry
+                # One row per note instead of rewriting the growing notes column
+                db.add(OrderNote(order_id=order_id, author_id=admin_id, body=new_entry, created_at=now))
             
             # Create status history entry
             status_history = OrderStatusHistory(
@@ -591,201 +698,111 @@ class OrderService:
             )
             db.add(status_history)
             
-            # Initialize tracking_data to None
-            tracking_data = None
-            
-            # Special handling for specific statuses
-            if status == OrderStatus.SHIPPED:
-                # Generate tracking number if not present
-                if not order.tracking_number:
-                    order.tracking_number = f"TRK-{uuid.uuid4().hex[:10].upper()}"
-                    
-                # Create tracking data dictionary
-                tracking_data = {
-                    "status": status,
-                    "location": location or "Distribution center",
-                    "checkpoint": {
-                        "status": status,
-                        "location": location or "Distribution center",
-                        "description": notes or f"Order {status.value.lower()}"
-                    }
-                }
+            # Statuses with a template also record a tracking checkpoint
+            template = TRACKING_TEMPLATES.get(status)
+            if template:
+                if status == OrderStatus.SHIPPED and not order.tracking_number:
+                    # Generate tracking number if not present
+                    order.tracking_number = f"TRK-{token_hex(5).upper()}"
                 
-                # Update tracking info in the same transaction
-                if tracking_data:
-                    await self._update_tracking_info_same_transaction(
-                        order_id=order_id,
-                        admin_id=admin_id,
-                        tracking_data=tracking_data,
-                        db=db
-                    )
-                    
-            elif status == OrderStatus.DELIVERED:
-                tracking_data = {
-                    "status": status,
-                    "location": location or "Delivery address",
-                    "checkpoint": {
-                        "status": status,
-                        "location": location or "Delivery address",
-                        "description": notes or "Order delivered to customer"
-                    }
-                }
-                
-                # Update tracking info in the same transaction
-                if tracking_data:
-                    await self._update_tracking_info_same_transaction(
-                        order_id=order_id,
-                        admin_id=admin_id,
-                        tracking_data=tracking_data,
-                        db=db
-                    )
-                    
-                if order.payment_method == PaymentMethod.CASH_ON_DELIVERY:
-                    # When order is delivered with cash on delivery, update payment status to completed
-                    order.payment_status = PaymentStatus.COMPLETED
-                    
-                    # Create a payment transaction
-                    payment = PaymentTransaction(
-                        order_id=order_id,
-                        transaction_id=f"COD-{uuid.uuid4().hex[:10].upper()}",
-                        amount=order.total,
-                        currency=order.payment_currency,
-                        method=order.payment_method,
-                        status=PaymentStatus.COMPLETED,
-                        details={"payment_method": "cash_on_delivery", "collected_by_id": admin_id}
-                    )
-                    db.add(payment)
-                    
-            elif status == OrderStatus.PROCESSING:
-                # Create tracking data for processing
+                default_location, default_description = template
+                checkpoint_location = location or default_location
                 tracking_data = {
                     "status": status,
-                    "location": "Warehouse",
+                    "location": checkpoint_location,
                     "checkpoint": {
                         "status": status,
-                        "location": "Warehouse",
-                        "description": "Order is being prepared for shipment"
+                        "location": checkpoint_location,
+                        "description": notes or default_description.format(status=status.value.lower()),
+                        "timestamp": now
                     }
                 }
                 
                 # Update tracking info in the same transaction
-                if tracking_data:
-                    await self._update_tracking_info_same_transaction(
-                        order_id=order_id,
-                        admin_id=admin_id,
-                        tracking_data=tracking_data,
-                        db=db
-                    )
+                await self._update_tracking_info_same_transaction(
+                    order=order,
+                    admin_id=admin_id,
+                    tracking_data=tracking_data,
+                    db=db
+                )
+            
+            if status == OrderStatus.DELIVERED and order.payment_method == PaymentMethod.CASH_ON_DELIVERY:
+                # When order is delivered with cash on delivery, update payment status to completed
+                order.payment_status = PaymentStatus.COMPLETED
+                
+                # Create a payment transaction
+                payment = PaymentTransaction(
+                    order_id=order_id,
+                    transaction_id=f"COD-{token_hex(5).upper()}",
+                    amount=order.total,
+                    currency=order.payment_currency,
+                    method=order.payment_method,
+                    status=PaymentStatus.COMPLETED,
+                    details={"payment_method": "cash_on_delivery", "collected_by_id": admin_id}
+                )
+                db.add(payment)
             
             # Commit the order status change
             await db.commit()
-            await db.refresh(order)
             
-            # Send notification based on status change
-            if background_tasks:
-                # Add to background tasks for async processing
-                background_tasks.add_task(self._send_order_status_notification_background, order.id)
+            # Send notification based on status change off the request path
+            background_tasks.add_task(self._send_order_status_notification_background, order.id)
             
             return order
 
-        except Exception as e:
-            # Rollback transaction in case of any error
-            await db.rollback()
-            
-            # Re-raise HTTP exceptions as they are intentional
-            if isinstance(e, (NotFoundException, BadRequestException)):
-                raise
-                
-            # Log the error
-            print(f"Error updating order status: {str(e)}")
-            
-            # Raise a generic exception with a user-friendly message
-            raise BadRequestException(f"Failed to update order status: {str(e)}")
-
     async def _update_tracking_info_same_transaction(
         self,
-        order_id: int,
+        order: Order,
         admin_id: int,
         tracking_data: Dict[str, Any],
         db: AsyncSession
     ) -> None:
-        """Update shipment tracking information within the same transaction"""
-        # Get or create shipment tracking
-        query = select(ShipmentTracking).where(ShipmentTracking.order_id == order_id)
-        result = await db.execute(query)
-        tracking = result.scalars().first()
+        """Update shipment tracking information for an already-loaded order within the same transaction"""
+        order_id = order.id
         
-        if not tracking:
-            # Create new tracking record
-            estimated_delivery = tracking_data.get("estimated_delivery")
-            if estimated_delivery:
-                estimated_delivery = self._convert_to_naive_datetime(estimated_delivery)
-                
-            tracking = ShipmentTracking(
-                order_id=order_id,
-                status=tracking_data.get("status"),
-                location=tracking_data.get("location"),
-                carrier=tracking_data.get("carrier"),
-                estimated_delivery=estimated_delivery,
-                tracking_number=tracking_data.get("tracking_number"),
-                details=tracking_data.get("details", {})
-            )
-            db.add(tracking)
-            
-            # Get the order to update tracking information
-            order = await self.get_order_by_id(order_id, None, db)
-            
-            # Update order tracking number if provided
-            if tracking_data.get("tracking_number"):
-                order.tracking_number = tracking_data["tracking_number"]
-                
-            # Update estimated delivery if provided
-            if estimated_delivery:
-                order.estimated_delivery = estimated_delivery
-        else:
-            # Update tracking information
-            if tracking_data.get("status"):
-                tracking.status = tracking_data["status"]
-                
-            if tracking_data.get("location"):
-                tracking.location = tracking_data["location"]
-                
-            if tracking_data.get("carrier"):
-                tracking.carrier = tracking_data["carrier"]
-                
-            if tracking_data.get("estimated_delivery"):
-                estimated_delivery = self._convert_to_naive_datetime(tracking_data["estimated_delivery"])
-                tracking.estimated_delivery = estimated_delivery
-                
-                # Update order estimated delivery
-                order = await self.get_order_by_id(order_id, None, db)
-                order.estimated_delivery = estimated_delivery
-                
-            if tracking_data.get("tracking_number"):
-                tracking.tracking_number = tracking_data["tracking_number"]
-                
-                # Update order tracking number
-                order = await self.get_order_by_id(order_id, None, db)
-                order.tracking_number = tracking_data["tracking_number"]
+        # Collect the supplied tracking fields
+        tracking_values = {}
+        for field in TRACKING_FIELDS:
+            value = tracking_data.get(field)
+            if value is None:
+                continue
+            if field == "estimated_delivery":
+                value = self._convert_to_naive_datetime(value)
+            tracking_values[field] = value
+        details = tracking_data.get("details")
+        
+        # Create or update the shipment tracking atomically with INSERT ... ON CONFLICT DO UPDATE
+        upsert = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = upsert(ShipmentTracking).values(
+            order_id=order_id,
+            details=details if details is not None else {},
+            **tracking_values
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ShipmentTracking.order_id],
+            set_={
+                **{field: stmt.excluded[field] for field in tracking_values},
+                "updated_at": func.now()
+            }
+        ).returning(ShipmentTracking)
+        tracking = (await db.scalars(stmt.execution_options(populate_existing=True))).one()
+        
+        if details:
+            # Merge details instead of replacing (a no-op for a freshly inserted record)
+            if isinstance(tracking.details, dict) and isinstance(details, dict):
+                tracking.details = {**(tracking.details or {}), **details}
+            else:
+                tracking.details = details
                 
-            if tracking_data.get("details"):
-                # Merge details instead of replacing
-                if isinstance(tracking.details, dict) and isinstance(tracking_data.get("details"), dict):
-                    tracking.details = {
-                        **(tracking.details or {}),
-                        **tracking_data["details"]
-                    }
-                else:
-                    tracking.details = tracking_data.get("details", {})
+        # Mirror order-level fields onto the order; flushed with the caller's other order changes
+        for field, value in tracking_values.items():
+            if field in ORDER_TRACKING_FIELDS:
+                setattr(order, field, value)
                     
         # Add checkpoint if provided
         if tracking_data.get("checkpoint"):
-            # Need to flush tracking first if it's new
-            if tracking.id is None:
-                await db.flush()
-                
             # Get checkpoint timestamp and convert if timezone-aware
-            checkpoint_timestamp = tracking_data["checkpoint"].get("timestamp", datetime.now())
+            checkpoint_timestamp = tracking_data["checkpoint"].get("timestamp") or datetime.now()
             if checkpoint_timestamp:
                 checkpoint_timestamp = self._convert_to_naive_datetime(checkpoint_timestamp)
                 
@@ -804,86 +821,128 @@ class OrderService:
         db_generator = get_db()
         db = await anext(db_generator)
         try:
-            order = await self.get_order_by_id(order_id, None, db)
-            customer = await self._get_user_by_id(order.customer_id, db)
+            # Load the order and its shipment tracking in one query
+            query = (
+                select(Order, ShipmentTracking)
+                .outerjoin(ShipmentTracking, ShipmentTracking.order_id == Order.id)
+                .where(Order.id == order_id)
+            )
+            result = await db.execute(query)
+            row = result.first()
+            if not row:
+                raise NotFoundException(f"Order with ID {order_id} not found")
+            order, tracking = row
+            email = await self._get_notification_email(order, db)
             
-            # Get tracking info if available
-            tracking_info = await self.get_tracking_info(order.id, order.customer_id, db)
+            # Nothing to send without an address; skip the checkpoint lookup and template work
+            if not email:
+                return
+            
+            # Build tracking info from the rows already loaded
+            tracking_info = await self._build_tracking_info(order, tracking, db)
             
             order_data = {
                 "id": order.id,
                 "order_number": order.order_number,
-                "status": order.status.value if hasattr(order.status, 'value') else str(order.status),
-                "customer_name": getattr(customer, 'full_name', customer.email),
+                "status": _enum_value(order.status),
+                "customer_name": email,
                 "frontend_url": Config.DOMAIN,
                 "current_year": datetime.now().year
             }
             
             # Send email
-            email_service = EmailService()
             await email_service.send_order_tracking_update(
-                to_email=customer.email,
+                to_email=email,
                 order_data=order_data,
                 tracking_data=tracking_info
             )
         except Exception as e:
-            print(f"Background notification error: {str(e)}")
+            logger.exception("Background notification error")
         finally:
             await db.close()
 
+    async def _get_notification_email(self, order: Order, db: AsyncSession) -> Optional[str]:
+        """
+        Customer email for an order's notifications, memoised briefly so the confirmation
+        and status notifications fired for the same order look the customer up once
+        """
+        now = monotonic()
+        cached = _notification_customers.get(order.id)
+        if cached is not None and now < cached[0]:
+            return cached[1]
+        
+        email = await db.scalar(select(User.email).where(User.id == order.customer_id))
+        
+        # Drop expired entries so the memo only ever holds recently notified orders
+        for expired_id in [key for key, (expiry, _) in _notification_customers.items() if expiry <= now]:
+            del _notification_customers[expired_id]
+        _notification_customers[order.id] = (now + NOTIFICATION_CUSTOMER_TTL, email)
+        return email
+
+    async def _build_tracking_info(
+        self, order: Order, tracking: Optional[ShipmentTracking], db: AsyncSession
+    ) -> Dict[str, Any]:
+        """Shape tracking information for an order and its (optional) shipment tracking row"""
+        if not tracking:
+            # Return basic info if no detailed tracking exists
+            return {
+                "order_id": order.id,
+                "order_number": order.order_number,
+                "status": order.status.value,
+                "tracking_number": order.tracking_number,
+                "estimated_delivery": order.estimated_delivery,
+                "checkpoints": []
+            }
+            
+        # Get checkpoints, newest first, as plain column rows rather than ORM instances
+        checkpoints_query = (
+            select(
+                ShipmentCheckpoint.id,
+                ShipmentCheckpoint.status,
+                ShipmentCheckpoint.location,
+                ShipmentCheckpoint.timestamp,
+                ShipmentCheckpoint.description
+            )
+            .where(ShipmentCheckpoint.shipment_id == tracking.id)
+            .order_by(ShipmentCheckpoint.timestamp.desc())
+        )
+        checkpoints_result = await db.execute(checkpoints_query)
+        checkpoints = [dict(row._mapping) for row in checkpoints_result]
+        
+        return {
+            "id": tracking.id,
+            "order_id": tracking.order_id,
+            "order_number": order.order_number,
+            "status": _enum_value(tracking.status),
+            "location": tracking.location,
+            "carrier": tracking.carrier,
+            "tracking_number": tracking.tracking_number or order.tracking_number,
+            "estimated_delivery": tracking.estimated_delivery or order.estimated_delivery,
+            "details": tracking.details or {},
+            "checkpoints": checkpoints
+        }
+
     async def get_tracking_info(self, order_id: int, user_id: Optional[int], db: AsyncSession) -> Dict[str, Any]:
         """Get tracking information for an order"""
         try:
-            # Check if user can access this order
-            order = await self.get_order_by_id(order_id, user_id, db)
-            
-            # Get shipment tracking
-            query = select(ShipmentTracking).where(ShipmentTracking.order_id == order_id)
-            result = await db.execute(query)
-            tracking = result.scalars().first()
-            
-            if not tracking:
-                # Return basic info if no detailed tracking exists
-                return {
-                    "order_id": order.id,
-                    "order_number": order.order_number,
-                    "status": order.status.value,
-                    "tracking_number": order.tracking_number,
-                    "estimated_delivery": order.estimated_delivery,
-                    "checkpoints": []
-                }
+            # Fetch the order and its shipment tracking in one query; the ownership
+            # filter doubles as the access check
+            query = (
+                select(Order, ShipmentTracking)
+                .outerjoin(ShipmentTracking, ShipmentTracking.order_id == Order.id)
+                .where(Order.id == order_id)
+            )
+            if user_id is not None:
+                query = query.where(Order.customer_id == user_id)
                 
-            # Get checkpoints
-            checkpoints_query = select(ShipmentCheckpoint).where(
-                ShipmentCheckpoint.shipment_id == tracking.id
-            ).order_by(ShipmentCheckpoint.timestamp.desc())
-            checkpoints_result = await db.execute(checkpoints_query)
-            checkpoints_data = checkpoints_result.scalars().all()
-            
-            # Format response with checkpoints
-            checkpoints = [
-                {
-                    "id": cp.id,
-                    "status": cp.status.value if hasattr(cp.status, 'value') else cp.status,
-                    "location": cp.location,
-                    "timestamp": cp.timestamp,
-                    "description": cp.description
-                } 
-                for cp in checkpoints_data
-            ]
+            result = await db.execute(query)
+            row = result.first()
             
-            return {
-                "id": tracking.id,
-                "order_id": tracking.order_id,
-                "order_number": order.order_number,
-                "status": tracking.status.value if hasattr(tracking.status, 'value') else tracking.status,
-                "location": tracking.location,
-                "carrier": tracking.carrier,
-                "tracking_number": tracking.tracking_number or order.tracking_number,
-                "estimated_delivery": tracking.estimated_delivery or order.estimated_delivery,
-                "details": tracking.details or {},
-                "checkpoints": checkpoints
-            }
+            if not row:
+                raise NotFoundException(f"Order with ID {order_id} not found")
+            order, tracking = row
+            
+            return await self._build_tracking_info(order, tracking, db)
         
         except Exception as e:
             # Re-raise HTTP exceptions as they are intentional
@@ -891,7 +950,7 @@ class OrderService:
                 raise
                 
             # Log the error
-            print(f"Error retrieving tracking info: {str(e)}")
+            logger.exception("Error retrieving tracking info")
             
             # Raise a generic exception with a user-friendly message
             raise BadRequestException(f"Failed to retrieve tracking information: {str(e)}")
@@ -904,12 +963,12 @@ class OrderService:
         db: AsyncSession
     ) -> Dict[str, Any]:
         """Update shipment tracking information"""
-        try:
-            order = await self.get_order_by_id(order_id, None, db)
+        async with self._transactional(db, "update tracking information"):
+            order = await self.get_order_by_id(order_id, None, db, for_update=True)
             
             # Use the existing method to update tracking in the database
             await self._update_tracking_info_same_transaction(
-                order_id=order_id,
+                order=order,
                 admin_id=admin_id,
                 tracking_data=tracking_data,
                 db=db
@@ -919,18 +978,4 @@ class OrderService:
             await db.commit()
             
             # Return updated tracking info
-            return await self.get_tracking_info(order_id, None, db)
-            
-        except Exception as e:
-            # Rollback transaction in case of any error
-            await db.rollback()
-            
-            # Re-raise HTTP exceptions as they are intentional
-            if isinstance(e, (NotFoundException, BadRequestException)):
-                raise
-                
-            # Log the error
-            print(f"Error updating tracking info: {str(e)}")
-            
-            # Raise a generic exception with a user-friendly message
-            raise BadRequestException(f"Failed to update tracking information: {str(e)}")
\ No newline at end of file
+            return await self.get_tracking_info(order_id, None, db)
\ No newline at end of file
@@ -1,63 +1,75 @@
-from sqlalchemy import func, select, and_, desc
+from sqlalchemy import func, select, update, and_, desc, case, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 from typing import List, Optional, Tuple
 
-from ..models import Review, ReviewVote, Product, User, OrderItem
+from ..models import Review, ReviewVote, Product, User, Order, OrderItem
 from ..schemas.review import ReviewCreate, ReviewUpdate, ReviewVoteCreate
 from ..exceptions import NotFoundException, ConflictException, BadRequestException
 
 
+def _review_author_load():
+    """ReviewResponse only renders the author's id and name; built per query, not at import time"""
+    return selectinload(Review.user).load_only(User.id, User.first_name, User.last_name)
+
+
 class ReviewService:
     def __init__(self, db: AsyncSession):
         self.db = db
 
+    async def _get_review_with_user(self, review_id: int) -> Review:
+        """Reload a review with its author eager-loaded for ReviewResponse serialization"""
+        query = (
+            select(Review)
+            .options(_review_author_load())
+            .where(Review.id == review_id)
+            .execution_options(populate_existing=True)
+        )
+        return await self.db.scalar(query)
+
     async def create_review(self, user_id: int, review_data: ReviewCreate) -> Review:
         """Create a new review for a product"""
         
-        # Check if product exists
-        product_query = select(Product).where(Product.id == review_data.product_id)
-        product_result = await self.db.execute(product_query)
-        product = product_result.scalar_one_or_none()
+        # Check that the product exists and whether the user bought it (verified purchase) in one query
+        purchased = exists().where(
+            and_(
+                OrderItem.product_id == review_data.product_id,
+                OrderItem.order_id == Order.id,
+                Order.customer_id == user_id
+            )
+        )
+        product_query = select(Product.id, purchased).where(Product.id == review_data.product_id)
+        product_row = (await self.db.execute(product_query)).first()
         
-        if not product:
+        if product_row is None:
             raise NotFoundException("Product not found")
         
-        # Check if user already reviewed this product
-        existing_review_query = select(Review).where(
-            and_(Review.user_id == user_id, Review.product_id == review_data.product_id)
+        # Create review; the unique (user_id, product_id) index rejects a second review atomically
+        dialect_insert = pg_insert if self.db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = (
+            dialect_insert(Review)
+            .values(
+                user_id=user_id,
+                product_id=review_data.product_id,
+                rating=review_data.rating,
+                title=review_data.title,
+                comment=review_data.comment,
+                is_verified_purchase=product_row[1]
+            )
+            .on_conflict_do_nothing(index_elements=[Review.user_id, Review.product_id])
+            .returning(Review.id)
         )
-        existing_review_result = await self.db.execute(existing_review_query)
-        existing_review = existing_review_result.scalar_one_or_none()
+        review_id = await self.db.scalar(stmt)
         
-        if existing_review:
+        if review_id is None:
+            await self.db.rollback()
             raise ConflictException("You have already reviewed this product")
         
-        # Check if user purchased this product (verified purchase)
-        purchase_query = select(OrderItem).join(OrderItem.order).where(
-            and_(
-                OrderItem.product_id == review_data.product_id,
-                OrderItem.order.has(customer_id=user_id)
-            )
-        )
-        purchase_result = await self.db.execute(purchase_query)
-        is_verified_purchase = purchase_result.scalar_one_or_none() is not None
-        
-        # Create review
-        review = Review(
-            user_id=user_id,
-            product_id=review_data.product_id,
-            rating=review_data.rating,
-            title=review_data.title,
-            comment=review_data.comment,
-            is_verified_purchase=is_verified_purchase
-        )
-        
-        self.db.add(review)
         await self.db.commit()
-        await self.db.refresh(review)
         
-        return review
+        return await self._get_review_with_user(review_id)
 
     async def get_product_reviews(
         self, 
@@ -70,17 +82,15 @@ class ReviewService:
         """Get reviews for a product with pagination and sorting"""
         
         # Check if product exists
-        product_query = select(Product).where(Product.id == product_id)
-        product_result = await self.db.execute(product_query)
-        product = product_result.scalar_one_or_none()
+        product_exists = await self.db.scalar(select(Product.id).where(Product.id == product_id))
         
-        if not product:
+        if product_exists is None:
             raise NotFoundException("Product not found")
         
         # Build base query
         base_query = select(Review).where(
             and_(Review.product_id == product_id, Review.is_approved == True)
-        ).options(selectinload(Review.user))
+        ).options(_review_author_load())
         
         # Add sorting
         if sort_by == "rating":
@@ -95,38 +105,26 @@ class ReviewService:
         else:
             base_query = base_query.order_by(order_field.desc())
         
-        # Get total count
-        count_query = select(func.count()).select_from(Review).where(
-            and_(Review.product_id == product_id, Review.is_approved == True)
-        )
-        count_result = await self.db.execute(count_query)
-        total_count = count_result.scalar()
-        
         # Get paginated reviews
         paginated_query = base_query.offset(skip).limit(limit)
         reviews_result = await self.db.execute(paginated_query)
         reviews = reviews_result.scalars().all()
         
-        # Calculate average rating
-        avg_query = select(func.avg(Review.rating)).where(
+        # Total count, average rating and per-star breakdown in one aggregate query
+        stars = range(1, 6)
+        stats_query = select(
+            func.count(),
+            func.avg(Review.rating),
+            *(
+                func.count(case((and_(Review.rating >= rating, Review.rating < rating + 1), 1)))
+                for rating in stars
+            )
+        ).where(
             and_(Review.product_id == product_id, Review.is_approved == True)
         )
-        avg_result = await self.db.execute(avg_query)
-        average_rating = avg_result.scalar() or 0.0
-        
-        # Get rating breakdown
-        rating_breakdown = {}
-        for rating in range(1, 6):
-            rating_query = select(func.count()).select_from(Review).where(
-                and_(
-                    Review.product_id == product_id,
-                    Review.is_approved == True,
-                    Review.rating >= rating,
-                    Review.rating < rating + 1
-                )
-            )
-            rating_result = await self.db.execute(rating_query)
-            rating_breakdown[rating] = rating_result.scalar()
+        total_count, average_rating, *star_counts = (await self.db.execute(stats_query)).one()
+        average_rating = average_rating or 0.0
+        rating_breakdown = dict(zip(stars, star_counts))
         
         return reviews, total_count, average_rating, rating_breakdown
 
@@ -140,7 +138,8 @@ class ReviewService:
         
         # Build query
         query = select(Review).where(Review.user_id == user_id).options(
-            selectinload(Review.product)
+            _review_author_load(),
+            selectinload(Review.product).load_only(Product.id, Product.name, Product.slug)
         ).order_by(desc(Review.created_at))
         
         # Get total count
@@ -178,9 +177,8 @@ class ReviewService:
             review.comment = review_data.comment
         
         await self.db.commit()
-        await self.db.refresh(review)
         
-        return review
+        return await self._get_review_with_user(review.id)
 
     async def delete_review(self, review_id: int, user_id: int) -> None:
         """Delete a review (only by the review author)"""
@@ -202,42 +200,42 @@ class ReviewService:
     async def vote_review(self, review_id: int, user_id: int, vote_data: ReviewVoteCreate) -> ReviewVote:
         """Vote on a review as helpful or not helpful"""
         
-        # Check if review exists
-        review_query = select(Review).where(Review.id == review_id)
-        review_result = await self.db.execute(review_query)
-        review = review_result.scalar_one_or_none()
+        # Check the review exists and read this user's previous vote, locking the review's counter row
+        existing_query = (
+            select(Review.id, ReviewVote.is_helpful)
+            .outerjoin(ReviewVote, and_(ReviewVote.review_id == Review.id, ReviewVote.user_id == user_id))
+            .where(Review.id == review_id)
+            .with_for_update(of=Review)
+        )
+        existing = (await self.db.execute(existing_query)).first()
         
-        if not review:
+        if existing is None:
             raise NotFoundException("Review not found")
         
-        # Check if user already voted on this review
-        existing_vote_query = select(ReviewVote).where(
-            and_(ReviewVote.review_id == review_id, ReviewVote.user_id == user_id)
-        )
-        existing_vote_result = await self.db.execute(existing_vote_query)
-        existing_vote = existing_vote_result.scalar_one_or_none()
+        previous_vote = existing[1]
         
-        if existing_vote:
-            # Update existing vote
-            existing_vote.is_helpful = vote_data.is_helpful
-            vote = existing_vote
-        else:
-            # Create new vote
-            vote = ReviewVote(
-                review_id=review_id,
-                user_id=user_id,
-                is_helpful=vote_data.is_helpful
+        # Create or update the vote in a single upsert on the unique (review_id, user_id) index
+        dialect_insert = pg_insert if self.db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = (
+            dialect_insert(ReviewVote)
+            .values(review_id=review_id, user_id=user_id, is_helpful=vote_data.is_helpful)
+            .on_conflict_do_update(
+                index_elements=[ReviewVote.review_id, ReviewVote.user_id],
+                set_={"is_helpful": vote_data.is_helpful, "updated_at": func.now()}
             )
-            self.db.add(vote)
-        
-        # Update helpful votes count on review
-        helpful_votes_query = select(func.count()).select_from(ReviewVote).where(
-            and_(ReviewVote.review_id == review_id, ReviewVote.is_helpful == True)
+            .returning(ReviewVote)
         )
-        helpful_votes_result = await self.db.execute(helpful_votes_query)
-        review.helpful_votes = helpful_votes_result.scalar()
+        vote = (await self.db.scalars(stmt.execution_options(populate_existing=True))).one()
+        
+        # Adjust the helpful counter by the change instead of recounting every vote
+        delta = int(vote_data.is_helpful) - int(bool(previous_vote))
+        if delta:
+            await self.db.execute(
+                update(Review)
+                .where(Review.id == review_id)
+                .values(helpful_votes=func.coalesce(Review.helpful_votes, 0) + delta)
+            )
         
         await self.db.commit()
-        await self.db.refresh(vote)
         
         return vote
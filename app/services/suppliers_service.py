@@ -1,37 +1,48 @@
-from sqlalchemy import select
+import orjson
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from typing import Any, Dict, List
 
 from app import exceptions
+from ..db.redis import cache_get, cache_set, cache_delete
 from ..models.supplier import Supplier
 from ..models.user import User
-from ..schemas.suppliers import CreateSupplier, UpdateSupplier
+from ..schemas.suppliers import CreateSupplier, UpdateSupplier, SupplierResponse
 
 
-class SupplierService:
-    def __init__(self, db: AsyncSession):
-        self.db = db
+# Supplier reads repeat on every admin page; mutations invalidate, the TTL bounds staleness
+SUPPLIER_CACHE_TTL = 60
 
+# Columns SupplierResponse renders
+SUPPLIER_RESPONSE_COLUMNS = (
+    Supplier.id, Supplier.admin_id, Supplier.name, Supplier.contact_person, Supplier.email,
+    Supplier.phone, Supplier.tax_id, Supplier.payment_terms, Supplier.lead_time,
+    Supplier.website, Supplier.notes
+)
 
-    async def create_supplier(self, data: CreateSupplier, current_user: User) -> Supplier:
-        supplier = data.model_dump()
-        supplier_name = supplier["name"]
 
-        # check if the supplier exists
-        stmt = select(Supplier).filter_by(name=supplier_name, admin_id=current_user.id)
-        result = (await self.db.execute(stmt)).scalar_one_or_none()
+def supplier_list_cache_key(admin_id: int) -> str:
+    return f"suppliers:list:{admin_id}"
 
-        if result:
-            raise exceptions.SupplierExistsException()   # supplier already supplies products for current admin user
+def supplier_cache_key(admin_id: int, supplier_id: int) -> str:
+    return f"suppliers:get:{admin_id}:{supplier_id}"
 
-        new_supplier = Supplier(**supplier, admin_id=current_user.id)
-        self.db.add(new_supplier)
-        await self.db.commit()
-        await self.db.refresh(new_supplier)
 
-        return new_supplier
+class SupplierService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
 
+    async def _invalidate(self, admin_id: int, supplier_id: int) -> None:
+        await cache_delete(supplier_list_cache_key(admin_id), supplier_cache_key(admin_id, supplier_id))
 
-    async def get_supplier(self, supplier_id: int, current_user: User) -> Supplier:
+
+    async def _load_supplier(self, supplier_id: int, current_user: User) -> Supplier:
         result = await self.db.execute(
             select(Supplier).filter_by(id=supplier_id, admin_id=current_user.id)
         )
@@ -43,15 +54,66 @@ class SupplierService:
         return supplier
 
 
-    async def list_suppliers(self, current_user: User) -> list[Supplier]:
-        query = select(Supplier).filter_by(admin_id=current_user.id)
+    async def create_supplier(self, data: CreateSupplier, current_user: User) -> Supplier:
+        supplier = data.model_dump()
+
+        # insert unless the supplier already exists for this admin; the unique (admin_id, name) index decides
+        dialect_insert = pg_insert if self.db.bind.dialect.name == "postgresql" else sqlite_insert
+        stmt = (
+            dialect_insert(Supplier)
+            .values(**supplier, admin_id=current_user.id)
+            .on_conflict_do_nothing(index_elements=[Supplier.admin_id, Supplier.name])
+            .returning(Supplier)
+        )
+        new_supplier = await self.db.scalar(stmt)
+
+        if new_supplier is None:
+            await self.db.rollback()
+            raise exceptions.SupplierExistsException()   # supplier already supplies products for current admin user
+
+        await self.db.commit()
+        await self._invalidate(current_user.id, new_supplier.id)
+
+        return new_supplier
+
+
+    async def get_supplier(self, supplier_id: int, current_user: User) -> Dict[str, Any]:
+        key = supplier_cache_key(current_user.id, supplier_id)
+        cached = await cache_get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+
+        supplier = await self._load_supplier(supplier_id, current_user)
+        data = SupplierResponse.model_validate(supplier, from_attributes=True).model_dump(mode="json")
+        await cache_set(key, orjson.dumps(data), SUPPLIER_CACHE_TTL)
+
+        return data
+
+
+    async def list_suppliers(self, current_user: User) -> List[Dict[str, Any]]:
+        key = supplier_list_cache_key(current_user.id)
+        cached = await cache_get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+
+        query = (
+            select(Supplier)
+            .options(load_only(*SUPPLIER_RESPONSE_COLUMNS))
+            .filter_by(admin_id=current_user.id)
+        )
         result = await self.db.execute(query)
-        return result.scalars().all()
+        data = [
+            SupplierResponse.model_validate(supplier, from_attributes=True).model_dump(mode="json")
+            for supplier in result.scalars().all()
+        ]
+        await cache_set(key, orjson.dumps(data), SUPPLIER_CACHE_TTL)
+
+        return data
 
 
     async def update_supplier(self, supplier_id: int, data: UpdateSupplier, current_user: User) -> Supplier:
 
-        supplier = await self.get_supplier(supplier_id, current_user)
+        supplier = await self._load_supplier(supplier_id, current_user)
 
         # exclude fields that have not been explicitly set
         for field, value in data.model_dump(exclude_unset=True).items():
@@ -59,18 +121,22 @@ class SupplierService:
 
         await self.db.commit()
         await self.db.refresh(supplier)
+        await self._invalidate(current_user.id, supplier_id)
         return supplier
 
 
     async def delete_supplier(self, supplier_id: int, current_user: User) -> None:
 
-        # check if the supplier provided supplies products for the current admin user
-        stmt = select(Supplier).filter_by(id=supplier_id, admin_id=current_user.id)
-        result = (await self.db.execute(stmt)).scalars().first()
+        # delete only if the supplier provided supplies products for the current admin user
+        stmt = (
+            delete(Supplier)
+            .where(Supplier.id == supplier_id, Supplier.admin_id == current_user.id)
+            .returning(Supplier.id)
+        )
+        deleted_id = await self.db.scalar(stmt)
 
-        if not result:
+        if deleted_id is None:
             raise exceptions.CannotDeleteSupplier()  # current user cannot delete a supplier they didn't add
 
-        supplier = await self.get_supplier(supplier_id, current_user)
-        await self.db.delete(supplier)
         await self.db.commit()
+        await self._invalidate(current_user.id, supplier_id)
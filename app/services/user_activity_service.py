@@ -1,13 +1,21 @@
-from sqlalchemy import cast, desc, func, select, or_
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy import cast, desc, func, select, or_, tuple_
+from sqlalchemy.dialects.postgresql import JSONB, array
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.types import String
-from typing import List, Optional
+from sqlalchemy.orm import load_only
+from datetime import datetime
+from typing import List, Optional, Tuple
 
 from ..exceptions import NotFoundException
 from ..models import OrderItem, Product, User, UserActivity, Category
 
 
+# Columns SimpleProductResponse renders; skips description, specifications and other wide fields
+SIMPLE_PRODUCT_COLUMNS = (
+    Product.id, Product.slug, Product.name, Product.category_id,
+    Product.price, Product.discounted_price, Product.images, Product.created_at
+)
+
+
 class UserActivityService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -24,25 +32,34 @@ class UserActivityService:
         else:
             return []  # no activity data
 
-        stmt = stmt.order_by(UserActivity.timestamp.desc()).limit(10)
-        result = await self.db.execute(stmt)
-        category_ids = list(set([row[0] for row in result.all()]))
-
-        if not category_ids:
-            return []
+        # Resolve the recent categories inside the same statement as the recommendations
+        recent_categories = stmt.order_by(UserActivity.timestamp.desc()).limit(10).cte("recent_categories")
 
         rec_query = await self.db.execute(
             select(Product)
-            .where(Product.category_id.in_(category_ids))
+            .where(Product.category_id.in_(select(recent_categories.c.category_id)))
             .order_by(Product.views.desc())
             .limit(10)
         )
         return rec_query.scalars().all()
 
 
-    async def get_products(self, skip: int = 0, limit: int = 12, name: Optional[str] = None) -> List[Product]:
+    async def get_products(
+        self,
+        skip: int = 0,
+        limit: int = 12,
+        name: Optional[str] = None,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Product]:
+        """
+        List active products, newest first.
+
+        Pass `after` as the (created_at, id) of the last product on the previous page to
+        seek to the next page instead of using `skip`.
+        """
         stmt = (
             select(Product)
+            .options(load_only(*SIMPLE_PRODUCT_COLUMNS))
             .where(Product.is_active == True)
         )
         
@@ -50,11 +67,16 @@ class UserActivityService:
         if name:
             stmt = stmt.where(Product.name.ilike(f"%{name}%"))
         
+        if after is not None:
+            # Keyset pagination on (created_at, id), served by ix_products_active_created_at_id
+            stmt = stmt.where(tuple_(Product.created_at, Product.id) < after)
+        else:
+            stmt = stmt.offset(skip)
+        
         stmt = (
             stmt
-            .offset(skip)
+            .order_by(desc(Product.created_at), desc(Product.id))
             .limit(limit)
-            .order_by(desc(Product.created_at))
         )
         result = await self.db.execute(stmt)
         return result.scalars().all()
@@ -76,7 +98,7 @@ class UserActivityService:
         Recommend products based on category and tag overlap.
 
         Sorted by:
-        1. Estimated tag match score
+        1. Number of overlapping tags
         2. Popularity (number of OrderItems)
         """
 
@@ -88,37 +110,57 @@ class UserActivityService:
             Product.id != product.id,
         ]
 
-        tag_filters = []
-        for tag in product_tags:
-            tag_filters.append(Product.tags.contains([tag]))
+        popularity = func.count(OrderItem.id).label("popularity")
+
+        # The jsonb overlap operators are Postgres-only; other backends (the SQLite dev
+        # database) match tags in Python over the active candidates
+        if self.db.bind.dialect.name != "postgresql":
+            result = await self.db.execute(
+                select(Product, popularity)
+                .outerjoin(OrderItem, Product.id == OrderItem.product_id)
+                .where(*base_filters)
+                .group_by(Product.id)
+            )
+            tag_set = set(product_tags)
+
+            def tag_match_score(p: Product) -> int:
+                return len(set(p.tags or []) & tag_set)
+
+            candidates = [
+                row for row in result.all()
+                if row[0].category_id == product.category_id or tag_match_score(row[0]) > 0
+            ]
+            candidates.sort(key=lambda row: (tag_match_score(row[0]), row[1]), reverse=True)
+            return [row[0] for row in candidates[:limit]]
+
+        related_filters = [Product.category_id == product.category_id]
+        ordering = []
+
+        if product_tags:
+            tags = cast(Product.tags, JSONB)
+
+            # Any shared tag (jsonb ?| text[]), served by the GIN index on products.tags
+            related_filters.append(tags.op("?|")(array(product_tags)))
+
+            # Number of overlapping tags, counted in SQL
+            tag_values = func.jsonb_array_elements_text(tags).table_valued("value")
+            tag_score = (
+                select(func.count())
+                .select_from(tag_values)
+                .where(tag_values.c.value.in_(product_tags))
+                .scalar_subquery()
+            )
+            ordering.append(tag_score.desc())
 
         stmt = (
-            select(Product, func.count(OrderItem.id).label("popularity"))
+            select(Product, popularity)
             .outerjoin(OrderItem, Product.id == OrderItem.product_id)
-            .where(
-                *base_filters,
-                or_(
-                    Product.category_id == product.category_id,
-                    *tag_filters
-                )
-            )
+            .where(*base_filters, or_(*related_filters))
             .group_by(Product.id)
+            .order_by(*ordering, popularity.desc())
+            .limit(limit)
         )
 
         result = await self.db.execute(stmt)
-        rows = result.all()
-
-        # Score by number of overlapping tags (Python-side)
-        def tag_match_score(p: Product) -> int:
-            return len(set(p.tags or []) & set(product_tags))
-
-        # Sort by tag match score then popularity (desc)
-        sorted_products = sorted(
-            rows,
-            key=lambda row: (tag_match_score(row[0]), row[1]),  # row[0] is Product, row[1] is popularity
-            reverse=True
-        )
-
-        # Return just the Product instances
-        return [row[0] for row in sorted_products[:limit]]
+        return result.scalars().all()
 
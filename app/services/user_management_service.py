@@ -1,11 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func, desc, and_, or_
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import raiseload, selectinload
+from sqlalchemy import func, desc, and_, or_, case, tuple_, update
+from typing import Awaitable, Callable, List, Optional, Dict, Any, Tuple, TypeVar
 from datetime import datetime, timedelta
-import math
+import asyncio
+import base64
+import time
 
+from ..db.database import AsyncSessionLocal
 from ..models.user import User
 from ..models.order import Order
 from ..models.order_item import OrderItem
@@ -14,6 +17,7 @@ from ..models.customer_profile import CustomerProfile
 from ..enums import UserRole, OrderStatus, PaymentStatus
 from ..exceptions import NotFoundException, BadRequestException
 from ..schemas.user_management import (
+    CustomerProfileResponse,
     UserSummaryResponse, 
     UserDetailResponse, 
     UserListResponse,
@@ -22,94 +26,182 @@ from ..schemas.user_management import (
     OrderSummaryResponse
 )
 
+T = TypeVar("T")
+
+# Columns the admin user listing reads; selected as plain rows so no ORM instances are built
+USER_SUMMARY_COLUMNS = (
+    User.id,
+    User.first_name,
+    User.last_name,
+    User.email,
+    User.phone_number,
+    User.role,
+    User.is_verified,
+    User.created_at,
+    User.updated_at
+)
+
+# Seconds a user statistics snapshot is served before it is recomputed
+USER_STATISTICS_TTL = 60
+
+
+def encode_user_cursor(created_at: datetime, user_id: int) -> str:
+    """Opaque keyset cursor for the admin user listing"""
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{user_id}".encode()).decode()
+
+
+def decode_user_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, user_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(user_id)
+    except ValueError:
+        raise BadRequestException("Invalid pagination cursor")
+
+
+def _order_summaries_query(user_id: int):
+    """A user's orders, newest first, with the item count aggregated in SQL"""
+    return (
+        select(
+            Order.id,
+            Order.order_number,
+            Order.status,
+            Order.total,
+            Order.payment_status,
+            Order.created_at,
+            func.count(OrderItem.id).label("items_count")
+        )
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.customer_id == user_id)
+        .group_by(Order.id)
+        .order_by(desc(Order.created_at))
+    )
+
+
+def _order_summary(row) -> OrderSummaryResponse:
+    return OrderSummaryResponse(
+        id=row.id,
+        order_number=row.order_number,
+        status=row.status,
+        total=row.total,
+        payment_status=row.payment_status.value,
+        created_at=row.created_at,
+        items_count=row.items_count
+    )
+
 
 class UserManagementService:
     
+    def __init__(self):
+        self._statistics: Optional[UserStatsResponse] = None
+        self._statistics_expiry = 0.0
+    
     async def get_all_users(
         self, 
         db: AsyncSession,
         skip: int = 0,
         limit: int = 50,
         search: Optional[str] = None,
-        filters: Optional[UserSearchFilters] = None
+        filters: Optional[UserSearchFilters] = None,
+        cursor: Optional[str] = None
     ) -> UserListResponse:
-        """Get paginated list of all users with summary information"""
+        """
+        Get paginated list of all users with summary information
+        Pass the previous page's next_cursor as `cursor` to seek past it instead of using `skip`;
+        cursor pages report has_next only and leave total/pages unset, so they never run a COUNT
+        """
         
-        # Base query
-        query = select(User).options(
-            selectinload(User.orders),
-            selectinload(User.customer_profile)
-        )
+        # Collect the filter conditions once; they serve both the page and any fallback count
+        conditions = []
         
         # Apply search filter
         if search:
-            search_filter = or_(
-                User.first_name.ilike(f"%{search}%"),
-                User.last_name.ilike(f"%{search}%"),
-                User.email.ilike(f"%{search}%"),
-                User.phone_number.ilike(f"%{search}%")
-            )
-            query = query.where(search_filter)
+            search_pattern = f"%{search}%"
+            conditions.append(or_(
+                User.first_name.ilike(search_pattern),
+                User.last_name.ilike(search_pattern),
+                User.email.ilike(search_pattern),
+                User.phone_number.ilike(search_pattern)
+            ))
         
         # Apply filters
         if filters:
             if filters.role:
-                query = query.where(User.role == filters.role)
+                conditions.append(User.role == filters.role)
             if filters.is_verified is not None:
-                query = query.where(User.is_verified == filters.is_verified)
+                conditions.append(User.is_verified == filters.is_verified)
             if filters.created_after:
-                query = query.where(User.created_at >= filters.created_after)
+                conditions.append(User.created_at >= filters.created_after)
             if filters.created_before:
-                query = query.where(User.created_at <= filters.created_before)
+                conditions.append(User.created_at <= filters.created_before)
         
-        # Get total count
-        count_query = select(func.count()).select_from(User)
-        if search:
-            count_query = count_query.where(search_filter)
-        if filters:
-            if filters.role:
-                count_query = count_query.where(User.role == filters.role)
-            if filters.is_verified is not None:
-                count_query = count_query.where(User.is_verified == filters.is_verified)
-            if filters.created_after:
-                count_query = count_query.where(User.created_at >= filters.created_after)
-            if filters.created_before:
-                count_query = count_query.where(User.created_at <= filters.created_before)
+        # Base query; order statistics are aggregated separately for just this page
+        query = select(*USER_SUMMARY_COLUMNS).where(*conditions)
         
-        total_result = await db.execute(count_query)
-        total = total_result.scalar()
-        
-        # Apply pagination
-        query = query.offset(skip).limit(limit).order_by(desc(User.created_at))
+        # Apply pagination; keyset on (created_at, id) when a cursor is given, offset otherwise.
+        # Offset pages carry the filtered total via a window function, so no separate COUNT runs
+        if cursor:
+            query = query.where(tuple_(User.created_at, User.id) < decode_user_cursor(cursor))
+        else:
+            query = query.add_columns(func.count().over().label("total_count")).offset(skip)
+        # Peek one row past the page to learn whether another page follows
+        query = query.limit(limit + 1).order_by(desc(User.created_at), desc(User.id))
         
         result = await db.execute(query)
-        users = result.scalars().all()
+        rows = result.all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        
+        if cursor:
+            total = None
+        elif rows:
+            total = rows[0].total_count
+        elif skip:
+            # The page is past the end; count the filtered rows
+            count_query = select(func.count()).select_from(User).where(*conditions)
+            total = (await db.execute(count_query)).scalar() or 0
+        else:
+            total = 0
+        
+        # Order count, total spent and last order date per user on this page, computed in SQL
+        order_stats = {}
+        if rows:
+            stats_query = (
+                select(
+                    Order.customer_id,
+                    func.count(Order.id),
+                    func.coalesce(func.sum(Order.total), 0.0),
+                    func.max(Order.created_at)
+                )
+                .where(Order.customer_id.in_([row.id for row in rows]))
+                .group_by(Order.customer_id)
+            )
+            stats_result = await db.execute(stats_query)
+            order_stats = {customer_id: stats for customer_id, *stats in stats_result.all()}
         
-        # Convert to response format with statistics
+        # Convert to response format with statistics, in a single pass over the rows
         user_summaries = []
-        for user in users:
-            # Calculate user statistics
-            total_orders = len(user.orders) if user.orders else 0
-            total_spent = sum(order.total for order in user.orders) if user.orders else 0.0
-            last_order_date = max(order.created_at for order in user.orders) if user.orders else None
+        for row in rows:
+            total_orders, total_spent, last_order_date = order_stats.get(row.id, (0, 0.0, None))
             
-            user_summary = UserSummaryResponse(
-                id=user.id,
-                first_name=user.first_name,
-                last_name=user.last_name,
-                email=user.email,
-                phone_number=user.phone_number,
-                role=user.role,
-                is_verified=user.is_verified,
-                created_at=user.created_at,
-                updated_at=user.updated_at,
+            user_summaries.append(UserSummaryResponse(
+                id=row.id,
+                first_name=row.first_name,
+                last_name=row.last_name,
+                email=row.email,
+                phone_number=row.phone_number,
+                role=row.role,
+                is_verified=row.is_verified,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
                 total_orders=total_orders,
                 total_spent=total_spent,
                 last_order_date=last_order_date
-            )
-            user_summaries.append(user_summary)
+            ))
         
-        pages = math.ceil(total / limit) if limit > 0 else 1
+        if total is None:
+            pages = None
+        else:
+            pages = (total + limit - 1) // limit if limit > 0 else 1
         page = (skip // limit) + 1 if limit > 0 else 1
         
         return UserListResponse(
@@ -117,45 +209,42 @@ class UserManagementService:
             total=total,
             page=page,
             per_page=limit,
-            pages=pages
+            pages=pages,
+            has_next=has_next,
+            next_cursor=encode_user_cursor(rows[-1].created_at, rows[-1].id) if has_next else None
         )
     
     async def get_user_detail(self, user_id: int, db: AsyncSession) -> UserDetailResponse:
         """Get detailed information about a specific user"""
         
-        # Get user with all related data
-        query = select(User).options(
-            selectinload(User.orders).selectinload(Order.items),
+        # Get the user with their profile and review count; any other relationship access raises
+        reviews_count_query = (
+            select(func.count()).select_from(Review).where(Review.user_id == User.id).scalar_subquery()
+        )
+        query = select(User, reviews_count_query).options(
             selectinload(User.customer_profile),
-            selectinload(User.reviews)
+            raiseload("*")
         ).where(User.id == user_id)
         
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
+        row = (await db.execute(query)).first()
         
-        if not user:
+        if not row:
             raise NotFoundException(f"User with id {user_id} not found")
+        user, total_reviews = row
         
-        # Calculate statistics
-        total_orders = len(user.orders) if user.orders else 0
-        total_spent = sum(order.total for order in user.orders) if user.orders else 0.0
-        last_order_date = max(order.created_at for order in user.orders) if user.orders else None
+        # Calculate statistics over all orders in SQL
+        stats_query = select(
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total), 0.0),
+            func.max(Order.created_at)
+        ).where(Order.customer_id == user_id)
+        total_orders, total_spent, last_order_date = (await db.execute(stats_query)).one()
         
-        # Get recent orders (last 10)
+        # Get recent orders (last 10); only these rows leave the database
         recent_orders = []
-        if user.orders:
-            sorted_orders = sorted(user.orders, key=lambda x: x.created_at, reverse=True)[:10]
-            for order in sorted_orders:
-                items_count = len(order.items) if order.items else 0
-                recent_orders.append(OrderSummaryResponse(
-                    id=order.id,
-                    order_number=order.order_number,
-                    status=order.status,
-                    total=order.total,
-                    payment_status=order.payment_status.value,
-                    created_at=order.created_at,
-                    items_count=items_count
-                ))
+        if total_orders:
+            result = await db.execute(_order_summaries_query(user_id).limit(10))
+            recent_orders = [_order_summary(row) for row in result]
         
         # Get shipping addresses from customer profile
         shipping_addresses = []
@@ -175,9 +264,12 @@ class UserManagementService:
             total_orders=total_orders,
             total_spent=total_spent,
             last_order_date=last_order_date,
-            customer_profile=user.customer_profile.__dict__ if user.customer_profile else None,
+            customer_profile=(
+                CustomerProfileResponse.model_validate(user.customer_profile)
+                if user.customer_profile else None
+            ),
             recent_orders=recent_orders,
-            total_reviews=len(user.reviews) if user.reviews else 0,
+            total_reviews=total_reviews,
             account_created=user.created_at,
             shipping_addresses=shipping_addresses
         )
@@ -191,113 +283,108 @@ class UserManagementService:
     ) -> List[OrderSummaryResponse]:
         """Get all orders for a specific user"""
         
-        # Check if user exists
-        user_query = select(User).where(User.id == user_id)
-        user_result = await db.execute(user_query)
-        user = user_result.scalar_one_or_none()
-        
-        if not user:
-            raise NotFoundException(f"User with id {user_id} not found")
-        
         # Get user's orders
-        query = select(Order).options(
-            selectinload(Order.items)
-        ).where(Order.customer_id == user_id).order_by(desc(Order.created_at)).offset(skip).limit(limit)
+        result = await db.execute(_order_summaries_query(user_id).offset(skip).limit(limit))
+        order_summaries = [_order_summary(row) for row in result]
         
-        result = await db.execute(query)
-        orders = result.scalars().all()
-        
-        order_summaries = []
-        for order in orders:
-            items_count = len(order.items) if order.items else 0
-            order_summaries.append(OrderSummaryResponse(
-                id=order.id,
-                order_number=order.order_number,
-                status=order.status,
-                total=order.total,
-                payment_status=order.payment_status.value,
-                created_at=order.created_at,
-                items_count=items_count
-            ))
+        # Any order proves the user exists; only an empty page needs the existence check
+        if not order_summaries:
+            user_exists = await db.scalar(select(User.id).where(User.id == user_id).limit(1))
+            if user_exists is None:
+                raise NotFoundException(f"User with id {user_id} not found")
         
         return order_summaries
     
     async def ban_user(self, user_id: int, reason: str, db: AsyncSession) -> dict:
         """Ban a user account"""
         
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
-        
-        if not user:
-            raise NotFoundException(f"User with id {user_id} not found")
+        # For now, we'll use is_verified as a ban flag (you might want to add a dedicated ban field).
+        # The role guard lives in the UPDATE itself, so the happy path is a single statement
+        query = (
+            update(User)
+            .where(User.id == user_id, User.role != UserRole.ADMIN)
+            .values(is_verified=False)
+            .returning(User.email)
+            .execution_options(synchronize_session=False)
+        )
+        email = await db.scalar(query)
         
-        if user.role == UserRole.ADMIN:
+        if email is None:
+            # Nothing updated: tell a missing user apart from an admin
+            role = await db.scalar(select(User.role).where(User.id == user_id))
+            if role is None:
+                raise NotFoundException(f"User with id {user_id} not found")
             raise BadRequestException("Cannot ban admin users")
         
-        # For now, we'll use is_verified as a ban flag (you might want to add a dedicated ban field)
-        user.is_verified = False
-        
         await db.commit()
-        await db.refresh(user)
+        self._statistics = None
         
-        return {"message": f"User {user.email} has been banned", "reason": reason}
+        return {"message": f"User {email} has been banned", "reason": reason}
     
     async def unban_user(self, user_id: int, db: AsyncSession) -> dict:
         """Unban a user account"""
         
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
+        query = (
+            update(User)
+            .where(User.id == user_id)
+            .values(is_verified=True)
+            .returning(User.email)
+            .execution_options(synchronize_session=False)
+        )
+        email = await db.scalar(query)
         
-        if not user:
+        if email is None:
             raise NotFoundException(f"User with id {user_id} not found")
         
-        user.is_verified = True
-        
         await db.commit()
-        await db.refresh(user)
+        self._statistics = None
         
-        return {"message": f"User {user.email} has been unbanned"}
+        return {"message": f"User {email} has been unbanned"}
     
     async def delete_user(self, user_id: int, db: AsyncSession) -> dict:
         """Delete a user account (soft delete or hard delete based on business rules)"""
         
-        query = select(User).where(User.id == user_id)
-        result = await db.execute(query)
-        user = result.scalar_one_or_none()
+        # Load the user together with their order count - might want to prevent deletion
+        orders_count_query = (
+            select(func.count()).select_from(Order).where(Order.customer_id == User.id).scalar_subquery()
+        )
+        query = select(User, orders_count_query).where(User.id == user_id)
+        row = (await db.execute(query)).first()
         
-        if not user:
+        if not row:
             raise NotFoundException(f"User with id {user_id} not found")
+        user, orders_count = row
         
         if user.role == UserRole.ADMIN:
             raise BadRequestException("Cannot delete admin users")
         
-        # Check if user has orders - might want to prevent deletion
-        orders_query = select(func.count()).select_from(Order).where(Order.customer_id == user_id)
-        orders_result = await db.execute(orders_query)
-        orders_count = orders_result.scalar()
-        
         if orders_count > 0:
             raise BadRequestException(f"Cannot delete user with existing orders. User has {orders_count} orders.")
         
         await db.delete(user)
         await db.commit()
+        self._statistics = None
         
         return {"message": f"User account {user.email} has been deleted"}
     
     async def get_user_statistics(self, db: AsyncSession) -> UserStatsResponse:
-        """Get overall user statistics for admin dashboard"""
-        
-        # Total users
-        total_users_query = select(func.count()).select_from(User)
-        total_users_result = await db.execute(total_users_query)
-        total_users = total_users_result.scalar()
-        
-        # Active users (verified)
-        active_users_query = select(func.count()).select_from(User).where(User.is_verified == True)
-        active_users_result = await db.execute(active_users_query)
-        active_users = active_users_result.scalar()
+        """
+        Get overall user statistics for admin dashboard, served from a short-lived snapshot
+        The independent aggregates run concurrently, each in its own session
+        """
+        
+        if self._statistics is not None and time.monotonic() < self._statistics_expiry:
+            return self._statistics
+        
+        (
+            (total_users, active_users),
+            (users_with_orders, total_revenue, avg_order_value),
+            registration_trend
+        ) = await asyncio.gather(
+            self._in_own_session(self._get_user_counts),
+            self._in_own_session(self._get_order_aggregates),
+            self._in_own_session(self._get_registration_trend)
+        )
         
         # Banned users (unverified)
         banned_users = total_users - active_users
@@ -306,39 +393,7 @@ class UserManagementService:
         verified_users = active_users
         unverified_users = banned_users
         
-        # Users with orders
-        users_with_orders_query = select(func.count(func.distinct(Order.customer_id))).select_from(Order)
-        users_with_orders_result = await db.execute(users_with_orders_query)
-        users_with_orders = users_with_orders_result.scalar() or 0
-        
-        # Total revenue
-        total_revenue_query = select(func.sum(Order.total)).select_from(Order).where(Order.status == OrderStatus.DELIVERED)
-        total_revenue_result = await db.execute(total_revenue_query)
-        total_revenue = total_revenue_result.scalar() or 0.0
-        
-        # Average order value
-        avg_order_query = select(func.avg(Order.total)).select_from(Order).where(Order.status == OrderStatus.DELIVERED)
-        avg_order_result = await db.execute(avg_order_query)
-        avg_order_value = avg_order_result.scalar() or 0.0
-        
-        # Registration trend (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        registration_trend = {}
-        
-        for i in range(30):
-            date = thirty_days_ago + timedelta(days=i)
-            date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            date_end = date_start + timedelta(days=1)
-            
-            count_query = select(func.count()).select_from(User).where(
-                and_(User.created_at >= date_start, User.created_at < date_end)
-            )
-            count_result = await db.execute(count_query)
-            count = count_result.scalar()
-            
-            registration_trend[date.strftime('%Y-%m-%d')] = count
-        
-        return UserStatsResponse(
+        self._statistics = UserStatsResponse(
             total_users=total_users,
             active_users=active_users,
             banned_users=banned_users,
@@ -349,7 +404,54 @@ class UserManagementService:
             avg_order_value=float(avg_order_value),
             registration_trend=registration_trend
         )
-
+        self._statistics_expiry = time.monotonic() + USER_STATISTICS_TTL
+        return self._statistics
+    
+    async def _in_own_session(self, section: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """Run a statistics query in a dedicated session"""
+        async with AsyncSessionLocal() as session:
+            return await section(session)
+    
+    async def _get_user_counts(self, db: AsyncSession) -> Tuple[int, int]:
+        """Total and active (verified) users in one pass"""
+        users_query = select(
+            func.count(),
+            func.count().filter(User.is_verified == True)
+        ).select_from(User)
+        total_users, active_users = (await db.execute(users_query)).one()
+        return total_users, active_users
+    
+    async def _get_order_aggregates(self, db: AsyncSession) -> Tuple[int, float, float]:
+        """Users with orders, plus revenue and average value of delivered orders, in one pass"""
+        delivered_total = case((Order.status == OrderStatus.DELIVERED, Order.total))
+        orders_query = select(
+            func.count(func.distinct(Order.customer_id)),
+            func.sum(delivered_total),
+            func.avg(delivered_total)
+        ).select_from(Order)
+        users_with_orders, total_revenue, avg_order_value = (await db.execute(orders_query)).one()
+        return users_with_orders or 0, total_revenue or 0.0, avg_order_value or 0.0
+    
+    async def _get_registration_trend(self, db: AsyncSession) -> Dict[str, int]:
+        """
+        Registration trend (last 30 days), one GROUP BY over the whole window
+        The window is a range scan on ix_users_created_at_id
+        """
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        window_start = thirty_days_ago.replace(hour=0, minute=0, second=0, microsecond=0)
+        registration_day = func.date(User.created_at)
+        trend_query = (
+            select(registration_day, func.count())
+            .where(and_(User.created_at >= window_start, User.created_at < window_start + timedelta(days=30)))
+            .group_by(registration_day)
+        )
+        daily_counts = {str(day): count for day, count in (await db.execute(trend_query)).all()}
+        
+        registration_trend = {}
+        for i in range(30):
+            day = (window_start + timedelta(days=i)).strftime('%Y-%m-%d')
+            registration_trend[day] = daily_counts.get(day, 0)
+        return registration_trend
 
 # Create singleton instance
 user_management_service = UserManagementService()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+# Settings are read at import time; give the test run a throwaway SQLite database
+# and placeholder credentials before anything under `app` is imported
+_db_dir = tempfile.mkdtemp()
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_db_dir}/test.db")
+for name, value in {
+    "SECRET_KEY": "test",
+    "JWT_SECRET": "test",
+    "JWT_ALGORITHM": "HS256",
+    "JTI_EXPIRY": "3600",
+    "ACCESS_TOKEN_EXPIRY": "3600",
+    "REFRESH_TOKEN_EXPIRY": "86400",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "DOMAIN": "localhost",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "test@example.com",
+    "MAIL_PORT": "587",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "Dirahealth",
+    "MAIL_STARTTLS": "false",
+    "MAIL_SSL_TLS": "false",
+    "USE_CREDENTIALS": "false",
+    "VALIDATE_CERTS": "false",
+    "MPESA_CONSUMER_KEY": "test",
+    "MPESA_CONSUMER_SECRET": "test",
+    "MPESA_BUSINESS_SHORT_CODE": "174379",
+    "MPESA_PASSKEY": "test",
+    "MPESA_CALLBACK_URL": "https://localhost/api/mpesa/callback",
+    "MPESA_BUSINESS_NAME": "Dirahealth",
+}.items():
+    os.environ.setdefault(name, value)
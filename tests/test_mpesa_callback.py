@@ -0,0 +1,103 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.database import AsyncSessionLocal, init_db
+from app.enums import MpesaTransactionStatus, MpesaTransactionType, OrderStatus, PaymentMethod, PaymentStatus
+from app.models import Order, User
+from app.models.mpesa_transaction import MpesaCallback, MpesaTransaction
+from app.services.mpesa_service import mpesa_service
+
+
+CHECKOUT_REQUEST_ID = "ws_CO_191220191020363925"
+
+SUCCESS_CALLBACK = {
+    "Body": {
+        "stkCallback": {
+            "MerchantRequestID": "29115-34620561-1",
+            "CheckoutRequestID": CHECKOUT_REQUEST_ID,
+            "ResultCode": 0,
+            "ResultDesc": "The service request is processed successfully.",
+            "CallbackMetadata": {
+                "Item": [
+                    {"Name": "Amount", "Value": 1500.0},
+                    {"Name": "MpesaReceiptNumber", "Value": "NLJ7RT61SV"},
+                    {"Name": "TransactionDate", "Value": 20191219102115},
+                    {"Name": "PhoneNumber", "Value": 254708374149},
+                ]
+            },
+        }
+    }
+}
+
+
+async def _create_pending_order() -> int:
+    async with AsyncSessionLocal() as db:
+        customer = User(
+            email="customer@example.com",
+            hashed_password="not-a-real-hash",
+            first_name="Jane",
+            last_name="Wanjiku",
+            phone_number="254708374149",
+        )
+        db.add(customer)
+        await db.flush()
+
+        order = Order(
+            order_number="ORD-TEST-0001",
+            customer_id=customer.id,
+            shipping_address={"city": "Nairobi"},
+            billing_address={"city": "Nairobi"},
+            payment_method=PaymentMethod.MPESA,
+            payment_amount=1500.0,
+            subtotal=1500.0,
+            tax=0.0,
+            shipping_cost=0.0,
+            total=1500.0,
+        )
+        db.add(order)
+        await db.flush()
+
+        db.add(MpesaTransaction(
+            merchant_request_id="29115-34620561-1",
+            checkout_request_id=CHECKOUT_REQUEST_ID,
+            phone_number="254708374149",
+            amount=1500.0,
+            transaction_type=MpesaTransactionType.C2B.value,
+            order_id=order.id,
+        ))
+        await db.commit()
+        return order.id
+
+
+async def _run_successful_callback():
+    await init_db()
+    order_id = await _create_pending_order()
+
+    # Same path as the callback endpoint: persist the raw callback, then finalise it
+    async with AsyncSessionLocal() as db:
+        callback_id = await mpesa_service.persist_callback(SUCCESS_CALLBACK, db)
+    processed = await mpesa_service.finalise_callback(callback_id, SUCCESS_CALLBACK)
+
+    async with AsyncSessionLocal() as db:
+        transaction = await db.scalar(
+            select(MpesaTransaction).where(MpesaTransaction.checkout_request_id == CHECKOUT_REQUEST_ID)
+        )
+        order = await db.get(Order, order_id)
+        callback = await db.get(MpesaCallback, callback_id)
+        return processed, transaction, order, callback
+
+
+def test_successful_stk_callback_records_payment():
+    processed, transaction, order, callback = asyncio.run(_run_successful_callback())
+
+    assert processed is True
+    assert callback.processed is True
+    assert callback.processing_error is None
+
+    assert transaction.transaction_status == MpesaTransactionStatus.SUCCESS.value
+    assert transaction.mpesa_receipt_number == "NLJ7RT61SV"
+    assert transaction.result_code == 0
+
+    assert order.payment_status == PaymentStatus.COMPLETED
+    assert order.status == OrderStatus.PROCESSING